@@ -0,0 +1,189 @@
+import os
+import io
+import time
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import file_io
+from transfer import CopyProgress, read_file_with_limits
+from export_plan import record_throughput
+
+ARCHIVE_FORMATS = ("tar", "zip")
+read_ahead_per_worker = 2  # Files read ahead per reader thread (bounds the memory used by the pipeline)
+
+
+def member_size(name, size, archive_format):
+    """Bytes a member takes in the archive, including headers (upper bound)."""
+    name_length = len(name.encode('utf-8'))
+    if archive_format == "tar":
+        # Header block, data padded to 512 bytes, GNU long-name blocks for names over 100 bytes
+        long_name = 512 + (name_length + 511) // 512 * 512 if name_length > 100 else 0
+        return 512 + long_name + (size + 511) // 512 * 512
+    # Local header + central directory entry (with ZIP64 extras) and the stored data
+    return 30 + 46 + 2 * name_length + 48 + size
+
+
+def archive_trailer_size(archive_format):
+    # tar: end-of-archive blocks padded to the 10240-byte record; zip: (ZIP64) end of central directory
+    return tarfile.RECORDSIZE if archive_format == "tar" else 98
+
+
+class ArchiveWriter:
+    """Writes members sequentially into one archive, or into volumes of at most `volume_size` bytes.
+
+    Every volume is a complete archive (extractable on its own) and is written to a
+    temporary name that is only renamed once the volume is closed.
+    """
+
+    def __init__(self, destination, base_name, archive_format="tar", volume_size=None):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {archive_format!r}")
+        self.destination = destination
+        self.base_name = base_name
+        self.archive_format = archive_format
+        self.volume_size = volume_size
+        self.volume_number = 0
+        self.volume_bytes = 0
+        self.archive = None
+        self.file = None
+        self.path = None
+        self.paths = []
+        self.names = set()
+
+    def _volume_path(self):
+        if self.volume_size:
+            return os.path.join(self.destination, f"{self.base_name}.part{self.volume_number:03d}.{self.archive_format}")
+        return os.path.join(self.destination, f"{self.base_name}.{self.archive_format}")
+
+    def _open_volume(self):
+        self.volume_number += 1
+        self.path = self._volume_path()
+        self.volume_bytes = archive_trailer_size(self.archive_format)
+        self.file = file_io.open_file(self.path + ".tmp", 'wb')
+        if self.archive_format == "tar":
+            self.archive = tarfile.open(fileobj=self.file, mode="w", format=tarfile.GNU_FORMAT)
+        else:
+            self.archive = zipfile.ZipFile(self.file, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def _close_archive(self):
+        # tarfile/zipfile do not close a file object they were given
+        try:
+            self.archive.close()
+        finally:
+            self.file.close()
+            self.archive = self.file = None
+
+    def _close_volume(self):
+        self._close_archive()
+        file_io.replace(self.path + ".tmp", self.path)
+        self.paths.append(self.path)
+
+    def _unique_name(self, name):
+        # Songs with the same file name from different folders would overwrite each other when extracted
+        base, extension = os.path.splitext(name)
+        candidate, number = name, 1
+        while candidate in self.names:
+            number += 1
+            candidate = f"{base} ({number}){extension}"
+        self.names.add(candidate)
+        return candidate
+
+    def add(self, name, data, mtime=None):
+        name = self._unique_name(name)
+        size = member_size(name, len(data), self.archive_format)
+        if self.archive and self.volume_size and self.volume_bytes + size > self.volume_size:
+            self._close_volume()
+        if self.archive is None:
+            self._open_volume()
+            if self.volume_size and self.volume_bytes + size > self.volume_size:
+                print(f"Warning: {name} is larger than the volume size, volume {self.volume_number} will exceed it")
+        mtime = mtime or time.time()
+        if self.archive_format == "tar":
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = mtime
+            self.archive.addfile(info, io.BytesIO(data))
+        else:
+            info = zipfile.ZipInfo(name, date_time=time.localtime(max(mtime, 315532800))[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            self.archive.writestr(info, data)
+        self.volume_bytes += size
+
+    def close(self):
+        """Finishes the current volume; returns the paths of all volumes written."""
+        if self.archive:
+            self._close_volume()
+        return self.paths
+
+    def abort(self):
+        """Removes the volume being written (the volumes already closed are kept)."""
+        if self.archive:
+            try:
+                self._close_archive()
+            finally:
+                file_io.remove(self.path + ".tmp")
+
+
+def export_archive(songs, destination, archive_format="tar", volume_size=None, read_workers=4,
+                   limits=None, base_name=None, should_stop=None):
+    """Streams the songs into a stored (uncompressed) tar/zip archive on `destination`.
+
+    Sources are read in parallel by `read_workers` threads (at most `read_ahead_per_worker`
+    files ahead each) while a single writer appends them to the archive in selection
+    order, so the destination only sees one sequential file. Returns (successful, failed).
+    """
+    os.makedirs(destination, exist_ok=True)
+    base_name = base_name or time.strftime("selection_%Y%m%d_%H%M%S")
+    writer = ArchiveWriter(destination, base_name, archive_format, volume_size)
+    progress = CopyProgress(sum(song.get("size") or 0 for song in songs))
+    successful = failed = 0
+
+    def read_song(song):
+        data = read_file_with_limits(song["path"], limits)
+        return data, file_io.getmtime(song["path"])
+
+    print(f"Writing {len(songs)} songs to a {archive_format} archive in {destination} "
+          f"(reading with {read_workers} workers{', volumes of ' + format(volume_size / 1024 ** 2, ',.0f') + ' MB' if volume_size else ''})...")
+    with ThreadPoolExecutor(max_workers=read_workers) as executor:
+        pending = deque()
+        remaining = iter(songs)
+        try:
+            while True:
+                # Keep the readers busy, but never more than the read-ahead window in memory
+                while len(pending) < read_workers * read_ahead_per_worker:
+                    song = next(remaining, None)
+                    if song is None:
+                        break
+                    pending.append((song, executor.submit(read_song, song)))
+                if not pending or (should_stop and should_stop()):
+                    break
+                song, future = pending.popleft()
+                try:
+                    data, mtime = future.result()
+                except OSError as e:
+                    failed += 1
+                    progress.skip(song.get("size") or 0)
+                    print(f"Failed to read {song['path']}: {e}")
+                    continue
+                if not song.get("size"):
+                    progress.skip(-len(data))
+                writer.add(os.path.basename(song["path"]), data, mtime)
+                progress.add(len(data))
+                successful += 1
+                if successful % 10 == 0 or not pending:
+                    print(f"Archived {successful + failed}/{len(songs)} songs - {progress.format()} - Failed: {failed}")
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            writer.abort()
+            raise
+        for _, future in pending:
+            future.cancel()
+    paths = writer.close()
+    record_throughput(destination, progress.copied_bytes, time.monotonic() - progress.start_time)
+    print(f"Archive export completed. Success: {successful}, Failed: {failed}")
+    for path in paths:
+        print(f"  {path} ({file_io.getsize(path) / 1024 ** 2:,.1f} MB)")
+    return successful, failed
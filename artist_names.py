@@ -0,0 +1,56 @@
+import re
+import hashlib
+import unicodedata
+from functools import lru_cache
+
+# Rules applied to every raw artist tag (call resolve_artist.cache_clear() after changing them at runtime,
+# and rescan once so the cache is rebuilt with the new names). They are not idempotent: a canonical
+# name must not be resolved again ("The A Team" -> "a team" -> "team"), use the stored artist_id instead.
+leading_articles = ("the", "a", "an")  # "The Beatles" and "Beatles, The" both become "beatles"
+strip_featured_artists = True  # "Artist feat. X" / "Artist (ft. X)" are grouped under "artist"
+featured_markers = ("feat.", "feat", "ft.", "ft", "featuring")  # Words that start a featured-artist suffix
+artist_cache_size = 65536  # Distinct raw artist strings memoized (bounded LRU)
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
+    return " ".join(text.lower().split())
+
+
+def _strip_featured(name):
+    markers = "|".join(re.escape(marker) for marker in sorted(featured_markers, key=len, reverse=True))
+    # The marker must be a whole word, optionally inside brackets: "x (feat. y)", "x ft y"
+    return re.sub(rf"\s*[\(\[]?\s*\b(?:{markers})(?:\s+|(?<=\.)).*$", "", name).strip() or name
+
+
+def _strip_article(name):
+    """Removes one leading (or trailing ", the") article; the remainder is kept even if it starts with another."""
+    for article in leading_articles:
+        if name.startswith(article + " ") and len(name) > len(article) + 1:
+            return name[len(article) + 1:]
+        if name.endswith(", " + article):
+            return name[:-len(article) - 2]
+    return name
+
+
+def artist_id(name):
+    """Stable 63-bit integer ID of a canonical artist name."""
+    digest = hashlib.md5(name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') & 0x7FFFFFFFFFFFFFFF
+
+
+@lru_cache(maxsize=artist_cache_size)
+def resolve_artist(raw_artist):
+    """Returns (canonical name, artist id) of a raw artist tag; each distinct string is resolved once.
+
+    Only for raw tags (and names typed by the user): resolving a canonical name again may strip more.
+    """
+    name = _normalize(raw_artist or "") or "unknown"
+    if strip_featured_artists:
+        name = _strip_featured(name)
+    name = _strip_article(name)
+    return name, artist_id(name)
+
+
+def canonical_artist(raw_artist):
+    return resolve_artist(raw_artist)[0]
@@ -0,0 +1,161 @@
+import os
+import time
+import tempfile
+from itertools import islice
+import mp3_selector
+import file_io
+import export_plan
+from parallel_walk import walk_files
+from simulated_io import SimulatedBackend
+from scan_errors import ScanErrorLog
+from fanout_export import export_fanout
+from music_cache import get_cache_filename, load_cache_data
+from cache_snapshot import get_snapshot_filename, load_snapshot
+
+# Folder used for the benchmarks (ideally on the disk being evaluated)
+benchmark_folder = r"D:\Music"
+benchmark_rounds = 3  # Runs per variant; the best time is reported
+benchmark_limit = None  # Limit of files per run (None = whole folder)
+benchmark_listing_latency = 0.02  # Seconds added to every directory listing to imitate an SMB/NFS round trip
+benchmark_share_latency = 0.005  # Seconds added to every file operation (stat, open, read...) in the network share benchmark
+benchmark_share_bandwidth_mb_s = 50  # Bandwidth of the simulated share (None = unlimited)
+benchmark_error_rate = 0.0  # Probability of an injected I/O error per operation in the network share benchmark
+benchmark_copy_songs = 100  # Songs copied by the multi-destination export benchmark
+benchmark_copy_destinations = 3  # Destinations of the multi-destination export benchmark
+
+def time_best(func, rounds=None):
+    """Executa `func` várias vezes e retorna o melhor tempo e o último resultado."""
+    best = float('inf')
+    result = None
+    for _ in range(rounds or benchmark_rounds):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def print_results(title, results):
+    """Imprime uma tabela com o tempo de cada variante e o ganho relativo à primeira."""
+    print(f"\n=== {title} ===")
+    baseline = results[0][1]
+    for name, seconds, detail in results:
+        speedup = baseline / seconds if seconds else float('inf')
+        print(f"{name:<24} {seconds:8.3f}s  {speedup:5.2f}x  {detail}")
+
+def bench_scan_schedulers(folder):
+    """Compara a ordem de leitura do os.walk (fifo) com o agendador por localidade.
+
+    Para resultados representativos em HDD o cache de páginas do SO deve estar frio
+    entre as rodadas (por exemplo, reinicie ou use um conjunto de arquivos maior que a RAM).
+    """
+    results = []
+    original = mp3_selector.scan_scheduler
+    try:
+        for scheduler in ("fifo", "locality"):
+            mp3_selector.scan_scheduler = scheduler
+            seconds, songs = time_best(lambda: mp3_selector.list_mp3_files_parallel(folder, benchmark_limit))
+            results.append((scheduler, seconds, f"{len(songs)} songs"))
+    finally:
+        mp3_selector.scan_scheduler = original
+    print(f"Detected disk type: {'HDD' if mp3_selector.is_rotational_device(folder) else 'SSD/unknown'}")
+    print_results("Tag extraction scheduler", results)
+
+def bench_cache_load(folder):
+    """Compara a partida a quente pelo cache JSON e pelo snapshot binário (carga + agrupamento por artista).
+
+    O cache e o snapshot da pasta precisam existir (rode o mp3_selector.py uma vez antes).
+    """
+    cache_file = get_cache_filename(folder)
+    snapshot_file = get_snapshot_filename(folder)
+    if not os.path.exists(cache_file) or not os.path.exists(snapshot_file):
+        print(f"Cache or snapshot missing for {folder}, skipping the cache load benchmark.")
+        return
+
+    def load_json():
+        songs = load_cache_data(cache_file)["songs"]
+        return songs, mp3_selector.group_by_artist(songs)
+
+    def load_binary():
+        _, songs = load_snapshot(snapshot_file)
+        return songs, songs.group_by_artist()
+
+    results = []
+    for name, loader, path in (("json", load_json, cache_file), ("snapshot (mmap)", load_binary, snapshot_file)):
+        seconds, (songs, groups) = time_best(loader)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        results.append((name, seconds, f"{len(songs)} songs, {len(groups)} artists, {size_mb:.1f} MB file"))
+    print_results("Cache load", results)
+
+def with_backend(backend, func):
+    """Executa `func` com todo o acesso a arquivos passando por `backend`."""
+    previous = file_io.use_backend(backend)
+    try:
+        return func()
+    finally:
+        file_io.use_backend(previous)
+
+def bench_directory_walk(folder):
+    """Compara a listagem sequencial de pastas com a concorrente, com latência injetada em cada listagem."""
+    backend = SimulatedBackend(latency={"scandir": benchmark_listing_latency})
+    results = []
+    for listings in (1, 4, mp3_selector.walk_workers):
+        seconds, count = with_backend(backend, lambda: time_best(lambda: sum(1 for _ in walk_files(folder, listings))))
+        results.append((f"{listings} listing(s)", seconds, f"{count} files, {benchmark_listing_latency * 1000:g} ms per listing"))
+    print_results("Directory walk", results)
+
+def bench_network_scan(folder):
+    """Varredura completa (listagem + tags) como se a pasta estivesse num compartilhamento de rede lento.
+
+    Cada operação paga `benchmark_share_latency`, as leituras dividem `benchmark_share_bandwidth_mb_s`
+    e `benchmark_error_rate` injeta erros de I/O, que devem aparecer como arquivos ilegíveis.
+    """
+    results = []
+    original = mp3_selector.scan_scheduler, mp3_selector.walk_workers
+    try:
+        # A ordem por localidade depende do disco real; num compartilhamento a ordem é a da listagem
+        mp3_selector.scan_scheduler = "fifo"
+        for walkers in (1, original[1]):
+            mp3_selector.walk_workers = walkers
+            backend = SimulatedBackend(benchmark_share_latency, benchmark_share_bandwidth_mb_s, benchmark_error_rate, seed=1)
+            error_log = ScanErrorLog()
+            seconds, songs = with_backend(backend, lambda: time_best(
+                lambda: mp3_selector.list_mp3_files_parallel(folder, benchmark_limit, error_log=error_log), rounds=1))
+            error_log.summary()
+            results.append((f"{walkers} listing(s)", seconds,
+                            f"{len(songs)} songs, {sum(backend.counts.values())} operations, {backend.errors} injected errors"))
+    finally:
+        mp3_selector.scan_scheduler, mp3_selector.walk_workers = original
+    print_results(f"Network share scan ({benchmark_share_latency * 1000:g} ms per operation)", results)
+
+def bench_fanout_export(folder):
+    """Compara uma cópia por destino com a exportação em leque (cada música lida uma vez).
+
+    Leituras e escritas dividem `benchmark_share_bandwidth_mb_s`, como um disco de origem lento.
+    """
+    songs = [{"path": path} for path in islice(walk_files(folder), benchmark_copy_songs)]
+    original_limits, original_throughput_file = mp3_selector.copy_limits, export_plan.throughput_file
+    mp3_selector.copy_limits = None
+    results = []
+    try:
+        for name in ("one copy per destination", "fan-out"):
+            backend = SimulatedBackend(bandwidth_mb_s=benchmark_share_bandwidth_mb_s)
+            with tempfile.TemporaryDirectory() as target:
+                # As cópias de teste não entram nas medições usadas pelo planejador
+                export_plan.throughput_file = os.path.join(target, "copy_throughput.json")
+                destinations = [os.path.join(target, f"stick{number}") for number in range(benchmark_copy_destinations)]
+                if name == "fan-out":
+                    run = lambda: export_fanout(songs, destinations, mp3_selector.parallel_workers)
+                else:
+                    run = lambda: [mp3_selector.copy_or_link_selected_songs_parallel(songs, destination) for destination in destinations]
+                seconds, _ = with_backend(backend, lambda: time_best(run, rounds=1))
+            results.append((name, seconds, f"{len(songs)} songs x {len(destinations)} destinations, "
+                                           f"{backend.bytes['read'] / 1024 ** 2:,.1f} MB read from the source"))
+    finally:
+        mp3_selector.copy_limits, export_plan.throughput_file = original_limits, original_throughput_file
+    print_results("Multi-destination export", results)
+
+if __name__ == "__main__":
+    bench_scan_schedulers(benchmark_folder)
+    bench_directory_walk(benchmark_folder)
+    bench_network_scan(benchmark_folder)
+    bench_fanout_export(benchmark_folder)
+    bench_cache_load(benchmark_folder)
@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import math
+import mmap
+import struct
+from array import array
+from collections.abc import Sequence
+
+from music_cache import atomic_write, cache_lock, get_cache_filename
+
+# Binary warm-start snapshot of the music cache:
+#   magic, header length, JSON header, then 8-byte aligned sections:
+#   string offsets (uint64, one more than the strings), string data (UTF-8),
+#   one fixed-width array per column and the artist table (name string index and
+#   canonical artist id per local artist number; the "artist" column holds local numbers).
+SNAPSHOT_MAGIC = b"MP3SNAP1"
+SNAPSHOT_VERSION = 2
+_prefix = struct.Struct("<8sI")
+
+# Column -> array typecode. Strings are indexes into the string table (-1 = None).
+STRING_COLUMNS = ("path", "title", "album", "genre")
+NUMBER_COLUMNS = (("id", "q"), ("size", "q"), ("mtime", "d"), ("year", "i"),
+                  ("track", "i"), ("duration", "d"), ("bitrate", "i"))
+
+
+def get_snapshot_filename(music_folder):
+    """Snapshot file next to the JSON cache of the folder."""
+    return os.path.splitext(get_cache_filename(music_folder))[0] + ".snap"
+
+
+def _to_number(value, typecode):
+    if value is None:
+        return math.nan if typecode == "d" else -1
+    return float(value) if typecode == "d" else int(value)
+
+
+def _from_number(value, typecode):
+    if typecode == "d":
+        return None if math.isnan(value) else value
+    return None if value == -1 else value
+
+
+def write_snapshot(path, songs, music_folder, folder_mod_time):
+    """Writes the songs as a snapshot (strings are stored once, numbers in fixed-width arrays)."""
+    strings = {}
+    string_data = bytearray()
+    string_offsets = array('Q', [0])
+
+    def intern(text):
+        if text is None:
+            return -1
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(string_offsets) - 1
+            string_data.extend(text.encode('utf-8'))
+            string_offsets.append(len(string_data))
+        return index
+
+    artist_numbers = {}
+    artist_table = array('i')
+    artist_keys = array('q')
+    columns = {name: array('i') for name in STRING_COLUMNS}
+    columns.update({name: array(typecode) for name, typecode in NUMBER_COLUMNS})
+    columns["artist"] = array('i')
+    for song in songs:
+        artist = song.get("artist", "unknown")
+        if artist not in artist_numbers:
+            artist_numbers[artist] = len(artist_table)
+            artist_table.append(intern(artist))
+            artist_keys.append(song["artist_id"])
+        columns["artist"].append(artist_numbers[artist])
+        for name in STRING_COLUMNS:
+            columns[name].append(intern(song.get(name)))
+        for name, typecode in NUMBER_COLUMNS:
+            columns[name].append(_to_number(song.get(name), typecode))
+
+    sections = [("string_offsets", string_offsets.tobytes()), ("string_data", bytes(string_data)),
+                ("artists", artist_table.tobytes()), ("artist_ids", artist_keys.tobytes())]
+    sections += [(name, column.tobytes()) for name, column in columns.items()]
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "music_folder": music_folder,
+        "folder_mod_time": folder_mod_time,
+        "count": len(columns["artist"]),
+        "typecodes": {**{name: "i" for name in STRING_COLUMNS}, **dict(NUMBER_COLUMNS), "artist": "i"},
+        "sections": {},
+    }
+    # Section offsets depend on the header length, which depends on the offsets: reserve room first
+    header_size = len(json.dumps(header)) + 64 * (len(sections) + 1)
+    offset = _align(_prefix.size + header_size)
+    for name, data in sections:
+        header["sections"][name] = [offset, len(data)]
+        offset = _align(offset + len(data))
+    header_bytes = json.dumps(header).encode('utf-8').ljust(header_size)
+
+    with atomic_write(path, binary=True) as f:
+        f.write(_prefix.pack(SNAPSHOT_MAGIC, header_size))
+        f.write(header_bytes)
+        for name, data in sections:
+            f.seek(header["sections"][name][0])
+            f.write(data)
+    return path
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class SnapshotData:
+    """Memory-mapped snapshot; columns are memoryviews over the mapping (nothing is copied)."""
+
+    def __init__(self, path):
+        with cache_lock(path, shared=True):
+            with open(path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _prefix.unpack_from(self.map)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a music cache snapshot: {path}")
+        self.header = json.loads(bytes(self.map[_prefix.size:_prefix.size + header_size]))
+        if self.header["version"] != SNAPSHOT_VERSION or self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Unsupported snapshot format: {path}")
+        self.count = self.header["count"]
+        view = memoryview(self.map)
+        sections = {name: view[offset:offset + length] for name, (offset, length) in self.header["sections"].items()}
+        self.string_offsets = sections["string_offsets"].cast('Q')
+        self.string_data = sections["string_data"]
+        self.artist_table = sections["artists"].cast('i')
+        self.artist_ids = sections["artist_ids"].cast('q')
+        self.typecodes = self.header["typecodes"]
+        self.columns = {name: sections[name].cast(typecode) for name, typecode in self.typecodes.items()}
+
+    def string(self, index):
+        if index < 0:
+            return None
+        return str(self.string_data[self.string_offsets[index]:self.string_offsets[index + 1]], 'utf-8')
+
+    def record(self, row):
+        """Builds the regular cache record (dict) of one song."""
+        artist = self.columns["artist"][row]
+        song = {"path": self.string(self.columns["path"][row]), "artist": self.string(self.artist_table[artist]),
+                "artist_id": self.artist_ids[artist]}
+        for name in STRING_COLUMNS[1:]:
+            song[name] = self.string(self.columns[name][row])
+        for name, typecode in NUMBER_COLUMNS:
+            song[name] = _from_number(self.columns[name][row], typecode)
+        return song
+
+
+class SnapshotSongs(Sequence):
+    """Read-only list of songs backed by a snapshot; records are built only when accessed."""
+
+    def __init__(self, data, rows=None):
+        self.data = data
+        self.rows = range(data.count) if rows is None else rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SnapshotSongs(self.data, self.rows[index])
+        return self.data.record(self.rows[index])
+
+    def song_ids(self):
+        """Song IDs of the rows, read from the integer id column without building records."""
+        ids = self.data.columns["id"]
+        if isinstance(self.rows, range) and self.rows.step == 1:
+            return ids[self.rows.start:self.rows.stop]
+        return [ids[row] for row in self.rows]
+
+    def group_by_artist(self):
+        """{artist id: SnapshotSongs}, grouped on the integer artist column without building records."""
+        artists = self.data.columns["artist"]
+        groups = {}
+        for row in self.rows:
+            groups.setdefault(artists[row], array('i')).append(row)
+        return {self.data.artist_ids[artist]: SnapshotSongs(self.data, rows) for artist, rows in groups.items()}
+
+
+def load_snapshot(path):
+    """Maps the snapshot file; returns (header, SnapshotSongs) or None if it is missing or invalid."""
+    if not os.path.exists(path):
+        return None
+    try:
+        data = SnapshotData(path)
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"Could not read snapshot {path}: {e}")
+        return None
+    return data.header, SnapshotSongs(data)
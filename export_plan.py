@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import shutil
+
+import file_io
+from music_cache import cache_folder, cache_lock, atomic_write, write_json_atomic
+
+# Copy throughput measured by earlier exports, per destination (bytes/s)
+throughput_file = os.path.join(cache_folder, "copy_throughput.json")
+
+max_measurements = 10  # Measurements kept per destination (the median is used)
+min_measured_seconds = 1.0  # Shorter exports are not measured (dominated by per-file overhead)
+PLAN_VERSION = 1
+
+
+def _load_throughput():
+    try:
+        with open(throughput_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_throughput(destination, copied_bytes, seconds):
+    """Remembers the throughput of a finished export to `destination`."""
+    if seconds < min_measured_seconds or copied_bytes <= 0:
+        return
+    try:
+        with cache_lock(throughput_file):
+            measurements = _load_throughput()
+            history = measurements.setdefault(os.path.normpath(destination), [])
+            history.append(copied_bytes / seconds)
+            del history[:-max_measurements]
+            with atomic_write(throughput_file, locked=False) as f:
+                json.dump(measurements, f, indent=2)
+    except OSError as e:
+        print(f"Could not save copy throughput: {e}")
+
+
+def estimate_throughput(destination):
+    """Median bytes/s measured for `destination` (or for all destinations if it was never used)."""
+    measurements = _load_throughput()
+    history = measurements.get(os.path.normpath(destination)) or [rate for rates in measurements.values() for rate in rates]
+    if not history:
+        return None
+    history = sorted(history)
+    return history[len(history) // 2]
+
+
+def get_free_space(path):
+    """Free bytes on the disk of `path` (or of its nearest existing parent if it does not exist yet)."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def get_song_size(song):
+    """Size from the cache record, read from disk only for records without it."""
+    if song.get("size") is None:
+        song["size"] = file_io.getsize(song["path"])
+    return song["size"]
+
+
+def is_already_copied(song, destination):
+    """True if the destination already holds this file (copies keep size and modification time)."""
+    try:
+        stat = file_io.stat(os.path.join(destination, os.path.basename(song["path"])))
+    except OSError:
+        return False
+    return stat.st_size == get_song_size(song) and abs(stat.st_mtime - (song.get("mtime") or 0)) < 2
+
+
+def build_plan(songs, music_folder, destination, copy_mode=True, archive_format=None):
+    """Plan of an export: songs, bytes to move, free space and expected duration. Nothing is written."""
+    total_bytes = sum(get_song_size(song) for song in songs)
+    existing = []
+    if copy_mode and not archive_format:
+        existing = [song["path"] for song in songs if is_already_copied(song, destination)]
+    existing_paths = set(existing)
+    bytes_to_copy = sum(get_song_size(song) for song in songs if song["path"] not in existing_paths) if copy_mode else 0
+    throughput = estimate_throughput(destination)
+    free_bytes = get_free_space(destination)
+    return {
+        "version": PLAN_VERSION,
+        "created": time.time(),
+        "music_folder": music_folder,
+        "destination": destination,
+        "copy_mode": copy_mode,
+        "archive_format": archive_format,
+        "songs": [{"path": song["path"], "size": get_song_size(song), "mtime": song.get("mtime"),
+                   "id": song.get("id"), "artist": song.get("artist"), "title": song.get("title")} for song in songs],
+        "total_bytes": total_bytes,
+        "existing_files": existing,
+        "bytes_to_copy": bytes_to_copy,
+        "free_bytes": free_bytes,
+        "fits": bytes_to_copy <= free_bytes,
+        "throughput_bytes_s": throughput,
+        "expected_seconds": bytes_to_copy / throughput if throughput else None,
+    }
+
+
+def print_plan(plan):
+    expected = plan["expected_seconds"]
+    print("=== Export plan (nothing was copied) ===")
+    print(f"Destination: {plan['destination']}")
+    print(f"Songs: {len(plan['songs'])} ({plan['total_bytes'] / 1024 ** 3:.2f} GB)")
+    if plan["existing_files"]:
+        print(f"Already at the destination: {len(plan['existing_files'])} files (skipped when the plan is applied)")
+    print(f"To copy: {plan['bytes_to_copy'] / 1024 ** 3:.2f} GB - free space: {plan['free_bytes'] / 1024 ** 3:.2f} GB"
+          + ("" if plan["fits"] else " - NOT ENOUGH SPACE"))
+    if expected is not None:
+        print(f"Expected duration: {time.strftime('%H:%M:%S', time.gmtime(expected))} "
+              f"at {plan['throughput_bytes_s'] / 1024 ** 2:.1f} MB/s (measured in earlier exports)")
+    else:
+        print("Expected duration: unknown (no earlier export has been measured)")
+
+
+def save_plan(plan, plan_file):
+    write_json_atomic(plan_file, plan, indent=2)
+    print(f"Plan saved: {plan_file}")
+
+
+def load_plan(plan_file):
+    """Reads a plan and returns (plan, songs still unchanged on disk, songs that changed or disappeared)."""
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version: {plan.get('version')}")
+    unchanged, changed = [], []
+    for song in plan["songs"]:
+        try:
+            stat = file_io.stat(song["path"])
+        except OSError:
+            changed.append(song)
+            continue
+        (unchanged if stat.st_size == song["size"] else changed).append(song)
+    return plan, unchanged, changed
@@ -0,0 +1,169 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from transfer import CopyProgress, read_file_with_limits, write_buffer_to_file
+from export_plan import get_song_size, record_throughput
+
+buffer_budget_mb = 256  # Default memory for files read but not yet written to every destination
+
+
+def _song_size(song):
+    try:
+        return get_song_size(song)
+    except OSError:
+        return 0
+
+
+class BufferBudget:
+    """Bytes of source files held in memory; `acquire` blocks while the budget is used up.
+
+    A file larger than the whole budget is let through once nothing else is held.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount, should_stop=None):
+        """Reserves `amount` bytes; returns False if `should_stop()` became true while waiting."""
+        with self.condition:
+            while self.used_bytes and self.used_bytes + amount > self.budget_bytes:
+                if should_stop and should_stop():
+                    return False
+                self.condition.wait(0.5)
+            self.used_bytes += amount
+            return True
+
+    def release(self, amount):
+        with self.condition:
+            self.used_bytes -= amount
+            self.condition.notify_all()
+
+
+class SharedFile:
+    """One source file read once and handed to every destination writer.
+
+    The data (or the read error) is shared; the budget is released when the
+    last destination is done with it.
+    """
+
+    def __init__(self, song, size, data, error, destinations, budget):
+        self.song = song
+        self.size = size
+        self.data = data
+        self.error = error
+        self.remaining = destinations
+        self.budget = budget
+        self.lock = threading.Lock()
+
+    def done(self):
+        with self.lock:
+            self.remaining -= 1
+            last = self.remaining == 0
+        if last:
+            self.data = None
+            self.budget.release(self.size)
+
+
+class DestinationWriter(threading.Thread):
+    """Writes the shared files to one destination, with its own queue and progress."""
+
+    def __init__(self, destination, total_songs, total_bytes, should_stop=None):
+        super().__init__(name=f"fanout-{destination}", daemon=True)
+        self.destination = destination
+        self.total_songs = total_songs
+        self.files = queue.Queue()
+        self.progress = CopyProgress(total_bytes)
+        self.should_stop = should_stop
+        self.successful = self.failed = 0
+
+    def run(self):
+        while True:
+            shared = self.files.get()
+            if shared is None:
+                break
+            try:
+                self.write(shared)
+            finally:
+                shared.done()
+            done = self.successful + self.failed
+            if done % 10 == 0 or done == self.total_songs:
+                print(f"[{self.destination}] {done}/{self.total_songs} songs - {self.progress.format()} - Failed: {self.failed}\n", end="")
+
+    def write(self, shared):
+        source_path = shared.song["path"]
+        if shared.error is not None or (self.should_stop and self.should_stop()):
+            self.failed += shared.error is not None
+            self.progress.skip(shared.size)
+            return
+        if len(shared.data) != shared.size:
+            # The file changed since its size was recorded
+            self.progress.skip(shared.size - len(shared.data))
+        destination_path = os.path.join(self.destination, os.path.basename(source_path))
+        try:
+            if write_buffer_to_file(shared.data, source_path, destination_path, self.progress, self.should_stop):
+                self.successful += 1
+            elif shared.data:
+                self.progress.skip(len(shared.data))
+            else:
+                self.successful += 1
+        except Exception as e:
+            self.failed += 1
+            self.progress.skip(len(shared.data))
+            print(f"[{self.destination}] Failed to write {os.path.basename(source_path)}: {e}\n", end="")
+
+
+def export_fanout(songs, destinations, read_workers=4, limits=None, buffer_mb=None, should_stop=None):
+    """Copies the songs to several destinations, reading every source file only once.
+
+    `read_workers` threads read the sources (honouring `limits`) into memory and every
+    destination has its own writer thread, so fast destinations do not wait for slow
+    ones. Files wait in memory until all destinations wrote them, up to `buffer_mb`:
+    once it is full, reading pauses until the slowest destination catches up.
+    Returns {destination: (successful, failed)}.
+    """
+    budget = BufferBudget((buffer_mb or buffer_budget_mb) * 1024 ** 2)
+    total_bytes = sum(_song_size(song) for song in songs)
+    writers = []
+    for destination in destinations:
+        os.makedirs(destination, exist_ok=True)
+        writers.append(DestinationWriter(destination, len(songs), total_bytes, should_stop))
+
+    def read_song(song, size):
+        try:
+            data, error = read_file_with_limits(song["path"], limits), None
+        except Exception as e:
+            data, error = None, e
+            print(f"Failed to read {song['path']}: {e}")
+        shared = SharedFile(song, size, data, error, len(writers), budget)
+        for writer in writers:
+            writer.files.put(shared)
+
+    print(f"Copying {len(songs)} songs to {len(destinations)} destinations, reading each song once "
+          f"({read_workers} readers, {budget.budget_bytes / 1024 ** 2:,.0f} MB buffer)...")
+    for writer in writers:
+        writer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=read_workers) as executor:
+            for song in songs:
+                size = _song_size(song)
+                if (should_stop and should_stop()) or not budget.acquire(size, should_stop):
+                    break
+                executor.submit(read_song, song, size)
+    finally:
+        for writer in writers:
+            writer.files.put(None)
+        for writer in writers:
+            writer.join()
+
+    results = {}
+    for writer in writers:
+        progress = writer.progress
+        record_throughput(writer.destination, progress.copied_bytes, time.monotonic() - progress.start_time)
+        results[writer.destination] = (writer.successful, writer.failed)
+        print(f"Export to {writer.destination} completed. Success: {writer.successful}, Failed: {writer.failed}")
+    return results
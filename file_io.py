@@ -0,0 +1,107 @@
+import os
+import shutil
+
+# Every access to the music library and to the copy destinations (scan, cache validation,
+# copies) goes through the functions below, which delegate to the current backend.
+# A different backend can imitate a network share in benchmarks (see simulated_io.py).
+
+
+class LocalBackend:
+    """Direct access to the local filesystem."""
+
+    def scandir(self, path):
+        return os.scandir(path)
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def open(self, path, mode='rb'):
+        return open(path, mode)
+
+    def remove(self, path):
+        os.remove(path)
+
+    def copystat(self, source_path, destination_path):
+        shutil.copystat(source_path, destination_path)
+
+    def replace(self, source_path, destination_path):
+        os.replace(source_path, destination_path)
+
+
+backend = LocalBackend()
+
+
+def use_backend(new_backend):
+    """Replaces the backend used from now on; returns the previous one."""
+    global backend
+    previous, backend = backend, new_backend
+    return previous
+
+
+def scandir(path):
+    return backend.scandir(path)
+
+
+def listdir(path):
+    with backend.scandir(path) as entries:
+        return [entry.name for entry in entries]
+
+
+def stat(path):
+    return backend.stat(path)
+
+
+def open_file(path, mode='rb'):
+    return backend.open(path, mode)
+
+
+def remove(path):
+    backend.remove(path)
+
+
+def copystat(source_path, destination_path):
+    backend.copystat(source_path, destination_path)
+
+
+def replace(source_path, destination_path):
+    backend.replace(source_path, destination_path)
+
+
+def exists(path):
+    try:
+        backend.stat(path)
+    except OSError:
+        return False
+    return True
+
+
+def getmtime(path):
+    return backend.stat(path).st_mtime
+
+
+def getsize(path):
+    return backend.stat(path).st_size
+
+
+def walk(top):
+    """Top-down os.walk (unreadable folders are skipped) built on the backend's scandir."""
+    stack = [top]
+    while stack:
+        path = stack.pop()
+        try:
+            with backend.scandir(path) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        dirs, files, links = [], [], set()
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+                if is_dir and entry.is_symlink():
+                    links.add(entry.name)
+            except OSError:
+                is_dir = False
+            (dirs if is_dir else files).append(entry.name)
+        yield path, dirs, files
+        # Same order as os.walk: subfolders depth-first in listing order; symlinked folders are not followed
+        stack.extend(os.path.join(path, name) for name in reversed(dirs) if name not in links)
@@ -0,0 +1,178 @@
+import re
+import shlex
+import bisect
+import unicodedata
+
+from artist_names import canonical_artist
+
+# Fields captured by the scan besides path/artist/title
+TEXT_FIELDS = ("artist", "album", "genre")
+NUMERIC_FIELDS = ("year", "track", "duration", "bitrate")
+OPERATORS = ("!=", ">=", "<=", "=", ">", "<", "~")
+# Field name, then the operator right after it; the rest of the term is the value (which may contain operators)
+_term_pattern = re.compile(r"^(\w+)(" + "|".join(re.escape(operator) for operator in OPERATORS) + r")(.*)$", re.DOTALL)
+
+
+def normalize_value(text):
+    """Same normalization as the artist names: no accents, lowercase."""
+    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII').lower().strip()
+
+
+def _first_int(text):
+    """Leading integer of tags like "1994-05-01" or "3/12" (None if there is none)."""
+    digits = ""
+    for char in str(text).strip():
+        if not char.isdigit():
+            break
+        digits += char
+    return int(digits) if digits else None
+
+
+def read_extended_tags(audio):
+    """Extended fields from a mutagen MP3 opened with ID3=EasyID3 (tags and stream info in one read)."""
+    tags = {
+        "album": audio.get("album", [""])[0] or None,
+        "genre": normalize_value(audio.get("genre", [""])[0]) or None,
+        "year": _first_int(audio.get("date", [""])[0]),
+        "track": _first_int(audio.get("tracknumber", [""])[0]),
+        "duration": None,
+        "bitrate": None,
+    }
+    info = getattr(audio, "info", None)
+    if info is not None:
+        tags["duration"] = round(info.length, 1)
+        tags["bitrate"] = int(info.bitrate / 1000)
+    return tags
+
+
+def build_indexes(songs):
+    """Secondary indexes: value -> positions for text fields, sorted (value, position) for numbers."""
+    text = {field: {} for field in TEXT_FIELDS}
+    numeric = {field: [] for field in NUMERIC_FIELDS}
+    for position, song in enumerate(songs):
+        for field in TEXT_FIELDS:
+            value = song.get(field)
+            if value:
+                text[field].setdefault(normalize_value(value), []).append(position)
+        for field in NUMERIC_FIELDS:
+            value = song.get(field)
+            if value is not None:
+                numeric[field].append((value, position))
+    for field in NUMERIC_FIELDS:
+        numeric[field].sort()
+        numeric[field] = {
+            "values": [value for value, _ in numeric[field]],
+            "positions": [position for _, position in numeric[field]],
+        }
+    return {"count": len(songs), "text": text, "numeric": numeric}
+
+
+def parse_filter_expression(expression):
+    """Parses "genre=rock year>=1990 duration<600" into (field, operator, value) conditions.
+
+    Conditions are combined with AND; values with spaces can be quoted
+    (album="abbey road"). Raises ValueError for unknown fields or operators.
+    """
+    conditions = []
+    for term in shlex.split(expression or ""):
+        match = _term_pattern.match(term)
+        if not match:
+            raise ValueError(f"Invalid filter term: {term!r}")
+        field, operator, value = match.groups()
+        field = field.lower()
+        if field in NUMERIC_FIELDS:
+            if operator == "~":
+                raise ValueError(f"Operator '~' is not supported for {field}")
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"Invalid number in filter term: {term!r}")
+        elif field in TEXT_FIELDS:
+            if operator not in ("=", "!=", "~"):
+                raise ValueError(f"Operator {operator!r} is not supported for {field}")
+            # Exact artist matches use the same canonical names as the cache
+            value = canonical_artist(value) if field == "artist" and operator != "~" else normalize_value(value)
+        else:
+            raise ValueError(f"Unknown filter field: {field!r}")
+        conditions.append((field, operator, value))
+    return conditions
+
+
+def _numeric_positions(index, operator, value):
+    values = index["values"]
+    positions = index["positions"]
+    if operator == "=":
+        return set(positions[bisect.bisect_left(values, value):bisect.bisect_right(values, value)])
+    if operator == ">=":
+        return set(positions[bisect.bisect_left(values, value):])
+    if operator == ">":
+        return set(positions[bisect.bisect_right(values, value):])
+    if operator == "<=":
+        return set(positions[:bisect.bisect_right(values, value)])
+    if operator == "<":
+        return set(positions[:bisect.bisect_left(values, value)])
+    return None
+
+
+def _condition_positions(indexes, field, operator, value):
+    """Positions matching one condition, or None for "not equal" (handled as exclusion)."""
+    if field in NUMERIC_FIELDS:
+        return _numeric_positions(indexes["numeric"][field], operator, value)
+    index = indexes["text"][field]
+    if operator == "~":
+        return {position for key, positions in index.items() if value in key for position in positions}
+    return set(index.get(value, []))
+
+
+def filter_songs(songs, expression, indexes=None):
+    """Songs matching the expression, evaluated against the indexes (rebuilt if they don't match `songs`)."""
+    conditions = parse_filter_expression(expression)
+    if not conditions:
+        return songs
+    if not indexes or indexes.get("count") != len(songs):
+        indexes = build_indexes(songs)
+
+    matched = None
+    excluded = set()
+    for field, operator, value in conditions:
+        if operator == "!=":
+            if field in NUMERIC_FIELDS:
+                excluded |= _numeric_positions(indexes["numeric"][field], "=", value)
+            else:
+                excluded |= set(indexes["text"][field].get(value, []))
+            continue
+        positions = _condition_positions(indexes, field, operator, value)
+        matched = positions if matched is None else matched & positions
+    if matched is None:
+        matched = set(range(len(songs)))
+    matched -= excluded
+
+    print(f"Filter '{expression}': {len(matched)} of {len(songs)} songs match")
+    return [songs[position] for position in sorted(matched)]
+
+
+def song_matches(song, conditions):
+    """Evaluates parsed conditions against a single song (for streaming modes without indexes)."""
+    for field, operator, value in conditions:
+        song_value = song.get(field)
+        if field in TEXT_FIELDS:
+            song_value = normalize_value(song_value) if song_value else None
+        if operator == "!=":
+            if song_value == value:
+                return False
+            continue
+        if song_value is None:
+            return False
+        if operator == "=" and song_value != value:
+            return False
+        if operator == "~" and value not in song_value:
+            return False
+        if operator == ">=" and not song_value >= value:
+            return False
+        if operator == ">" and not song_value > value:
+            return False
+        if operator == "<=" and not song_value <= value:
+            return False
+        if operator == "<" and not song_value < value:
+            return False
+    return True
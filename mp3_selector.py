@@ -4,136 +4,160 @@ import shutil
 import unicodedata
 import json
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from mutagen.easyid3 import EasyID3
+import threading
+import uuid
+import hashlib
+import gc
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from collections import defaultdict
 import pythoncom
 import win32com.client
+import worker_tuning
+from worker_tuning import WorkerAutotuner
+from transfer import CopyProgress, create_copy_limits, copy_file_with_limits
+from library_index import build_indexes, filter_songs, parse_filter_expression, song_matches
+from selection_history import get_song_id, make_rotation_sampler, recent_song_ids, record_export
+import file_io
+import music_cache
+from music_cache import (CACHE_VERSION, find_cache_file, get_cache_filename, get_folder_modification_time,
+                         load_cache_data, read_song_record, save_cache_data, write_json_atomic, atomic_write)
+from artist_names import resolve_artist
+from cache_snapshot import SnapshotSongs, get_snapshot_filename, load_snapshot, write_snapshot
+from scan_errors import ScanErrorLog, index_failures, skip_known_failure, split_known_failures
+from parallel_walk import walk_files
+from archive_export import export_archive
+from fanout_export import export_fanout
+from export_plan import (build_plan, get_free_space, get_song_size, is_already_copied, load_plan, print_plan,
+                         record_throughput, save_plan)
 
 # Define the path to the folder with MP3 files
 music_folder = r"D:\Music"
 destination_folder = r"C:\Users\alexg\Music\Temp3"
-cache_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")  # Pasta cache na raiz do projeto
+cache_folder = music_cache.cache_folder  # Pasta cache na raiz do projeto (compartilhada com a GUI)
 
 # Configuration
 test_limit = 999999  # Limit of files for the initial test (modifiable)
 songs_per_artist = 2  # Number of songs to select per artist in Group 1
 max_size_gb = 5  # Maximum total size of files to copy or link, in GB
 copy_mode = True  # If True, copy files; if False, create Windows shortcuts (.lnk)
+archive_format = None  # "tar" or "zip": stream the copied songs into one uncompressed archive instead of separate files
+archive_volume_mb = None  # Split the archive into volumes of at most this many MB (e.g. 4000 for FAT32 sticks)
+extra_destination_folders = []  # Copy the same selection to these folders too (e.g. more USB sticks), reading every song once
+fanout_buffer_mb = 256  # Memory for songs read but not yet written to every destination (a slow stick pauses reading beyond it)
+plan_only = False  # If True, only plan the export (songs, bytes, free space, expected duration) and save it to plan_file
+plan_file = os.path.join(cache_folder, "export_plan.json")  # Plan written by plan_only
+apply_plan_file = None  # If set to a saved plan, skip scanning/selection and export exactly the songs in it
 use_cache = True  # If True, use cache when available; if False, always rescan
 force_rescan = False  # If True, force rescan even if cache exists
+use_snapshot = True  # If True, also keep a binary snapshot of the cache and memory-map it on warm starts
+filter_expression = ""  # Only select songs matching e.g. "genre=rock year>=1990 duration<600" (empty = all songs)
+rotation_mode = None  # "avoid" songs exported in the last `rotation_runs` runs, "weight" to down-weight them, or None
+rotation_runs = 4  # Number of previous exports considered by the rotation
+rotation_weight = 0.2  # Relative chance of a recently exported song in "weight" mode
 parallel_workers = 4  # Number of parallel threads for processing
+walk_workers = 16  # Folders listed at the same time while scanning (network shares); 1 = sequential os.walk
+server_mode = False  # If True, keep the library in memory and serve selection jobs over HTTP
+server_host = "127.0.0.1"  # Address the selection server listens on (local only by default)
+server_port = 8765  # Port the selection server listens on
+server_job_workers = 2  # Number of selection/export jobs run at the same time
+server_io_workers = 4  # Maximum concurrent copies/shortcuts across all running jobs
+use_shards = False  # If True, scan and cache the library as independent shards (one cache segment each)
+extra_music_folders = []  # Additional library roots (other disks / NAS mounts), each scanned as its own shard
+shard_by_top_level = False  # If True, every top-level directory of a root is its own shard
+shard_processes = 4  # Number of processes used to scan stale shards at the same time
+shard_cache_folder = os.path.join(cache_folder, "shards")  # Where shard segments live (may be a shared mount)
+scan_shard_only = None  # If set to a shard path, only scan that shard, write its segment and exit
+scan_scheduler = "auto"  # "auto" (by disk type, detected on Linux and Windows), "locality" (directory/inode order, capped per disk) or "fifo"
+hdd_workers_per_device = 2  # Concurrent tag reads per spinning disk when the locality scheduler is used
+tag_prefix_bytes = 256 * 1024  # Bytes at the start of each file announced to the OS before reading tags
+low_memory_scan = False  # If True, stream scan results to an append-only store on disk instead of keeping them in memory
+low_memory_batch = 1000  # Maximum files in flight at once in low-memory mode
+low_memory_max_rss_mb = 512  # Peak memory target in low-memory mode (the in-flight window shrinks above it)
+autotune_workers = False  # If True, adapt scan/copy worker counts to measured throughput and remember them per library
+copy_bandwidth_mb_s = None  # Maximum total copy bandwidth in MB/s, shared by all copy workers (None = unlimited)
+copy_max_iops = None  # Maximum copy read operations per second, shared by all copy workers (None = unlimited)
 
 # Convert max size in GB to bytes for comparison
 max_size_bytes = max_size_gb * (1024 ** 3)
 
-# Function to normalize text (remove accents and convert to lowercase)
-def normalize_text(text):
-    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
-    return text.lower()
+# Token buckets shared by every copy (including concurrent server jobs)
+copy_limits = create_copy_limits(copy_bandwidth_mb_s, copy_max_iops)
 
-# Cache management functions
-def get_cache_filename(music_folder):
-    """Gera nome único do arquivo de cache baseado na pasta de música."""
-    folder_hash = abs(hash(music_folder)) % (10 ** 8)
-    return os.path.join(cache_folder, f"music_cache_{folder_hash}.json")
+# Secondary indexes of the last cache loaded (album, genre, year, ...), used by the filters
+loaded_indexes = None
 
-def get_latest_cache_file(music_folder):
-    """Encontra o arquivo de cache mais recente para a pasta de música."""
-    if not os.path.exists(cache_folder):
-        return None
-    
-    # Normalizar o caminho para comparação
-    normalized_music_folder = os.path.normpath(music_folder)
-    
-    cache_files = []
-    for file in os.listdir(cache_folder):
-        if file.startswith("music_cache_") and file.endswith(".json"):
-            cache_file_path = os.path.join(cache_folder, file)
-            try:
-                with open(cache_file_path, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                # Verificar se é para a mesma pasta (normalizada)
-                cached_folder = os.path.normpath(cache_data.get("music_folder", ""))
-                if cached_folder == normalized_music_folder:
-                    file_time = os.path.getmtime(cache_file_path)
-                    cache_files.append((file_time, cache_file_path, cache_data))
-            except:
-                continue
-    
-    if not cache_files:
-        return None
-    
-    # Retornar o arquivo mais recente
-    cache_files.sort(key=lambda x: x[0], reverse=True)
-    return cache_files[0][1]
-
-def get_folder_modification_time(folder):
-    """Obtém o tempo de modificação mais recente da pasta e subpastas."""
-    latest_time = 0
-    for root, dirs, files in os.walk(folder):
-        folder_time = os.path.getmtime(root)
-        if folder_time > latest_time:
-            latest_time = folder_time
-        for file in files:
-            if file.lower().endswith('.mp3'):
-                file_path = os.path.join(root, file)
-                try:
-                    file_time = os.path.getmtime(file_path)
-                    if file_time > latest_time:
-                        latest_time = file_time
-                except:
-                    continue
-    return latest_time
-
-def save_cache(songs, music_folder):
-    """Salva a lista de músicas no cache."""
+def save_cache(songs, music_folder, failures=None):
+    """Salva a lista de músicas (e os arquivos ilegíveis) no cache, de forma atômica."""
     try:
-        if not os.path.exists(cache_folder):
-            os.makedirs(cache_folder)
-        
-        cache_data = {
-            "timestamp": time.time(),
-            "music_folder": music_folder,
-            "folder_mod_time": get_folder_modification_time(music_folder),
-            "songs": songs,
-            "total_songs": len(songs)
-        }
-        
-        cache_file = get_cache_filename(music_folder)
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
-        
+        folder_mod_time = get_folder_modification_time(music_folder)
+        cache_file = save_cache_data(songs, music_folder, failures, folder_mod_time)
         print(f"Cache salvo: {cache_file}")
         print(f"Total de músicas em cache: {len(songs)}")
+        if use_snapshot:
+            save_cache_snapshot(songs, music_folder, folder_mod_time)
         return True
     except Exception as e:
         print(f"Erro ao salvar cache: {e}")
         return False
 
+def save_cache_snapshot(songs, music_folder, folder_mod_time):
+    """Grava o snapshot binário usado na partida a quente (o cache JSON continua sendo a referência)."""
+    try:
+        snapshot_file = write_snapshot(get_snapshot_filename(music_folder), songs, music_folder, folder_mod_time)
+        print(f"Snapshot salvo: {snapshot_file}")
+    except Exception as e:
+        print(f"Erro ao salvar snapshot: {e}")
+
+def load_cache_snapshot(music_folder, current_mod_time):
+    """Mapeia o snapshot binário se ele for mais novo que o cache JSON e que a pasta; senão retorna None."""
+    snapshot_file = get_snapshot_filename(music_folder)
+    cache_file = get_cache_filename(music_folder)
+    if not os.path.exists(snapshot_file) or not os.path.exists(cache_file):
+        return None
+    if os.path.getmtime(snapshot_file) < os.path.getmtime(cache_file):
+        print("Snapshot mais antigo que o cache JSON, ignorado.")
+        return None
+    snapshot = load_snapshot(snapshot_file)
+    if snapshot is None:
+        return None
+    header, songs = snapshot
+    if os.path.normpath(header["music_folder"]) != os.path.normpath(music_folder):
+        return None
+    # Arquivos removidos alteram o mtime da pasta, então não é preciso verificar cada arquivo
+    if current_mod_time > header["folder_mod_time"]:
+        return None
+    print(f"Snapshot carregado (mmap): {len(songs)} músicas")
+    return songs
+
 def load_cache(music_folder):
     """Carrega a lista de músicas do cache se disponível e válido."""
+    global loaded_indexes
+    loaded_indexes = None  # Nenhum índice vale até este cache ser aceito
     try:
-        cache_file = get_latest_cache_file(music_folder)
+        cache_file = find_cache_file(music_folder)
         if not cache_file:
             print("Nenhum arquivo de cache encontrado para esta pasta.")
             return None
         
-        if not os.path.exists(cache_file):
-            print("Arquivo de cache não encontrado.")
-            return None
+        current_mod_time = get_folder_modification_time(music_folder)
+        if use_snapshot:
+            songs = load_cache_snapshot(music_folder, current_mod_time)
+            if songs is not None:
+                return songs
         
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
+        cache_data = load_cache_data(cache_file)
+        if cache_data is None:
+            print("Arquivo de cache não encontrado ou inválido.")
+            return None
         
         # Verifica se o cache é para a mesma pasta
-        if cache_data.get("music_folder") != music_folder:
+        if os.path.normpath(cache_data.get("music_folder", "")) != os.path.normpath(music_folder):
             print("Cache é para uma pasta diferente.")
             return None
         
         # Verifica se a pasta foi modificada desde o cache
-        current_mod_time = get_folder_modification_time(music_folder)
         cached_mod_time = cache_data.get("folder_mod_time", 0)
         
         if current_mod_time > cached_mod_time:
@@ -148,13 +172,20 @@ def load_cache(music_folder):
         
         print("Verificando integridade do cache...")
         for song in songs:
-            if os.path.exists(song["path"]):
+            if file_io.exists(song["path"]):
                 valid_songs.append(song)
         
         if len(valid_songs) != len(songs):
             print(f"Cache parcialmente inválido: {len(songs) - len(valid_songs)} arquivos removidos.")
             return None
         
+        loaded_indexes = cache_data.get("indexes")
+        if cache_file != get_cache_filename(music_folder):
+            # Cache de uma versão anterior: regravado no formato e nome atuais
+            save_cache(valid_songs, music_folder, cache_data.get("failures"))
+        elif use_snapshot:
+            # Cache gravado sem snapshot (por exemplo pela GUI): a próxima execução usa o snapshot
+            save_cache_snapshot(valid_songs, music_folder, cached_mod_time)
         cache_age = time.time() - cache_data.get("timestamp", 0)
         print(f"Cache carregado com sucesso!")
         print(f"Data do cache: {time.ctime(cache_data.get('timestamp', 0))}")
@@ -167,10 +198,22 @@ def load_cache(music_folder):
         print(f"Erro ao carregar cache: {e}")
         return None
 
+def load_cached_failures(music_folder):
+    """Arquivos que falharam na última varredura, mesmo que o cache esteja desatualizado."""
+    cache_file = find_cache_file(music_folder)
+    if not cache_file:
+        return {}
+    cache_data = load_cache_data(cache_file)
+    return index_failures(cache_data.get("failures")) if cache_data else {}
+
 def list_mp3_files_with_cache(folder, limit=None):
     """Lista arquivos MP3 usando cache quando possível."""
-    global use_cache, force_rescan
+    global use_cache, force_rescan, loaded_indexes
+    loaded_indexes = None  # Só volta a ser definido se um cache for carregado abaixo
     
+    if use_shards:
+        return list_mp3_files_sharded([folder] + list(extra_music_folders), limit)
+
     # Tenta carregar do cache primeiro
     if use_cache and not force_rescan:
         print("Tentando carregar do cache...")
@@ -178,28 +221,226 @@ def list_mp3_files_with_cache(folder, limit=None):
         if cached_songs:
             if limit:
                 cached_songs = cached_songs[:limit]
+                loaded_indexes = None
             return cached_songs
     
     # Se não há cache válido, faz varredura completa
     print("Realizando varredura completa da pasta de música...")
-    songs = list_mp3_files_parallel(folder, limit)
+    # Arquivos que já falharam e não mudaram não são lidos de novo
+    known_failures = load_cached_failures(folder) if use_cache and not force_rescan else {}
+    error_log = ScanErrorLog()
+    songs = list_mp3_files_parallel(folder, limit, error_log=error_log, known_failures=known_failures)
+    error_log.summary()
     
     # Salva no cache para próximas execuções
     if songs and use_cache:
-        save_cache(songs, folder)
+        save_cache(songs, folder, error_log.failures)
     
     return songs
 
+# Sharded library: each shard is scanned and cached independently
+def get_library_shards(roots):
+    """Divide as raízes da biblioteca em shards (path, recursive)."""
+    shards = []
+    for library_root in roots:
+        library_root = os.path.normpath(library_root)
+        if not shard_by_top_level:
+            shards.append((library_root, True))
+            continue
+        # Arquivos soltos na raiz formam um shard não recursivo
+        shards.append((library_root, False))
+        with file_io.scandir(library_root) as entries:
+            subfolders = sorted(entry.path for entry in entries if entry.is_dir())
+        shards.extend((subfolder, True) for subfolder in subfolders)
+    return shards
+
+def get_shard_cache_filename(shard_path, recursive=True):
+    """Nome estável do segmento de cache do shard (igual entre processos e máquinas)."""
+    key = f"{os.path.normpath(shard_path)}|{'r' if recursive else 'top'}"
+    shard_hash = hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(shard_cache_folder, f"shard_{shard_hash}.json")
+
+def get_shard_modification_time(shard_path, recursive=True):
+    """Tempo de modificação mais recente do shard."""
+    if recursive:
+        return get_folder_modification_time(shard_path)
+    latest_time = file_io.getmtime(shard_path)
+    for file in file_io.listdir(shard_path):
+        if file.lower().endswith('.mp3'):
+            try:
+                latest_time = max(latest_time, file_io.getmtime(os.path.join(shard_path, file)))
+            except:
+                continue
+    return latest_time
+
+def scan_shard(shard_path, recursive=True, max_workers=None):
+    """Varre um único shard e grava seu segmento de cache. Pode rodar em outro processo ou máquina."""
+    mod_time = get_shard_modification_time(shard_path, recursive)
+    segment_file = get_shard_cache_filename(shard_path, recursive)
+    known_failures = {}
+    previous_segment = load_cache_data(segment_file)
+    if previous_segment:
+        known_failures = index_failures(previous_segment.get("failures"))
+    error_log = ScanErrorLog()
+    songs = list_mp3_files_parallel(shard_path, max_workers=max_workers, recursive=recursive,
+                                    error_log=error_log, known_failures=known_failures)
+    error_log.summary()
+    segment = {
+        "version": CACHE_VERSION,
+        "timestamp": time.time(),
+        "shard_path": os.path.normpath(shard_path),
+        "recursive": recursive,
+        "folder_mod_time": mod_time,
+        "songs": songs,
+        "total_songs": len(songs),
+        "failures": error_log.failures
+    }
+    # Outros processos/máquinas podem estar lendo o mesmo segmento
+    write_json_atomic(segment_file, segment)
+    print(f"Shard segment saved: {segment_file} ({len(songs)} songs)")
+    return songs
+
+def load_shard_segment(shard_path, recursive=True):
+    """Carrega o segmento do shard se ele ainda for válido; caso contrário retorna None."""
+    segment_file = get_shard_cache_filename(shard_path, recursive)
+    segment = load_cache_data(segment_file)
+    if segment is None:
+        return None
+
+    if os.path.normpath(segment.get("shard_path", "")) != os.path.normpath(shard_path):
+        return None
+    if get_shard_modification_time(shard_path, recursive) > segment.get("folder_mod_time", 0):
+        return None
+    songs = segment.get("songs", [])
+    if not all(file_io.exists(song["path"]) for song in songs):
+        return None
+    return songs
+
+def list_mp3_files_sharded(roots, limit=None):
+    """Carrega os segmentos válidos, revarre só os shards alterados (em processos) e junta tudo."""
+    shards = get_library_shards(roots)
+    print(f"Library split into {len(shards)} shards")
+
+    shard_songs = {}
+    stale_shards = []
+    for shard in shards:
+        songs = None
+        if use_cache and not force_rescan:
+            songs = load_shard_segment(*shard)
+        if songs is None:
+            stale_shards.append(shard)
+        else:
+            shard_songs[shard] = songs
+
+    print(f"Shards from cache: {len(shard_songs)}, shards to scan: {len(stale_shards)}")
+    if stale_shards:
+        # Cada processo usa seu próprio pool de threads para os metadados
+        with ProcessPoolExecutor(max_workers=min(shard_processes, len(stale_shards))) as executor:
+            future_to_shard = {executor.submit(scan_shard, shard[0], shard[1], parallel_workers): shard
+                               for shard in stale_shards}
+            for future in as_completed(future_to_shard):
+                shard = future_to_shard[future]
+                try:
+                    shard_songs[shard] = future.result()
+                except Exception as e:
+                    print(f"Failed to scan shard {shard[0]}: {e}")
+                    shard_songs[shard] = []
+
+    # Junta os segmentos na ordem dos shards para um resultado estável
+    songs = [song for shard in shards for song in shard_songs.get(shard, [])]
+    print(f"Merged {len(shards)} shards: {len(songs)} songs")
+    if limit:
+        songs = songs[:limit]
+    return songs
+
+# Disk-locality-aware scheduling of tag reads
+def is_rotational_device_windows(path):
+    """Windows: pergunta ao volume se ele tem "seek penalty" (HDD). None para compartilhamentos e erros."""
+    import ctypes
+    from ctypes import wintypes
+    drive = os.path.splitdrive(os.path.abspath(path))[0]
+    if not drive or drive.startswith("\\\\"):
+        return None  # Caminho UNC (compartilhamento de rede): não há disco local para consultar
+
+    class StoragePropertyQuery(ctypes.Structure):
+        _fields_ = [("PropertyId", ctypes.c_int), ("QueryType", ctypes.c_int), ("AdditionalParameters", ctypes.c_ubyte * 1)]
+
+    class DeviceSeekPenaltyDescriptor(ctypes.Structure):
+        _fields_ = [("Version", wintypes.DWORD), ("Size", wintypes.DWORD), ("IncursSeekPenalty", wintypes.BOOLEAN)]
+
+    IOCTL_STORAGE_QUERY_PROPERTY = 0x2D1400
+    STORAGE_DEVICE_SEEK_PENALTY_PROPERTY = 7
+    PROPERTY_STANDARD_QUERY = 0
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    kernel32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                                     wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+    kernel32.DeviceIoControl.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.LPVOID, wintypes.DWORD,
+                                         wintypes.LPVOID, wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), wintypes.LPVOID]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    # Acesso 0 basta para consultar propriedades (não exige administrador)
+    handle = kernel32.CreateFileW(f"\\\\.\\{drive}", 0, 0x1 | 0x2, None, 3, 0, None)  # FILE_SHARE_READ|WRITE, OPEN_EXISTING
+    if handle is None or handle == wintypes.HANDLE(-1).value:
+        return None
+    try:
+        query = StoragePropertyQuery(STORAGE_DEVICE_SEEK_PENALTY_PROPERTY, PROPERTY_STANDARD_QUERY)
+        descriptor = DeviceSeekPenaltyDescriptor()
+        returned = wintypes.DWORD()
+        if not kernel32.DeviceIoControl(handle, IOCTL_STORAGE_QUERY_PROPERTY, ctypes.byref(query), ctypes.sizeof(query),
+                                        ctypes.byref(descriptor), ctypes.sizeof(descriptor), ctypes.byref(returned), None):
+            return None
+        return bool(descriptor.IncursSeekPenalty)
+    finally:
+        kernel32.CloseHandle(handle)
+
+def is_rotational_device(path):
+    """Retorna True para HDD, False para SSD e None quando não é possível detectar (Linux e Windows)."""
+    if os.name == 'nt':
+        try:
+            return is_rotational_device_windows(path)
+        except (OSError, AttributeError, ValueError):
+            return None
+    try:
+        device = os.stat(path).st_dev
+        block_dir = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+        # Partições não têm queue/ própria; o disco pai fica um nível acima
+        for queue_dir in (os.path.join(block_dir, "queue"), os.path.join(block_dir, "..", "queue")):
+            rotational_file = os.path.join(queue_dir, "rotational")
+            if os.path.exists(rotational_file):
+                with open(rotational_file) as f:
+                    return f.read().strip() == "1"
+    except (OSError, AttributeError):
+        pass
+    return None
+
+def resolve_scan_scheduler(folder):
+    """Resolve `scan_scheduler` para "locality" ou "fifo"."""
+    if scan_scheduler != "auto":
+        return scan_scheduler
+    return "locality" if is_rotational_device(folder) else "fifo"
+
+def order_files_for_locality(file_paths):
+    """Ordena os arquivos por disco, diretório e inode; retorna pares (path, device)."""
+    keyed = []
+    for file_path in file_paths:
+        try:
+            stat = file_io.stat(file_path)
+            keyed.append(((stat.st_dev, os.path.dirname(file_path), stat.st_ino), file_path, stat.st_dev))
+        except OSError:
+            keyed.append(((float('inf'), file_path, 0), file_path, None))
+    keyed.sort(key=lambda item: item[0])
+    return [(file_path, device) for _, file_path, device in keyed]
+
 # Function to read metadata of an MP3 file
-def read_metadata(file_path):
+def read_metadata(file_path, error_log=None, prefix_bytes=None):
     try:
-        metadata = EasyID3(file_path)
-        artist = metadata.get("artist", ["Unknown"])[0]
-        title = metadata.get("title", ["Untitled"])[0]
-        artist = normalize_text(artist)
-        return {"path": file_path, "artist": artist, "title": title}
+        # Tags e informações do stream (duração, bitrate) na mesma leitura, no formato do cache
+        return read_song_record(file_path, prefix_bytes)
     except Exception as e:
-        print(f"Error reading {file_path}: {e}")
+        if error_log:
+            error_log.record(file_path, e)
+        else:
+            print(f"Error reading {file_path}: {e}")
         return None
 
 # Function to list MP3 files and extract metadata
@@ -209,7 +450,7 @@ def list_mp3_files(folder, limit=None):
     counter = 0
     current_folder = None
 
-    for root, dirs, files in os.walk(folder):
+    for root, dirs, files in file_io.walk(folder):
         if root != current_folder:
             print(f"Processing folder: {root}")
             current_folder = root
@@ -229,58 +470,110 @@ def list_mp3_files(folder, limit=None):
     print(f"Completed listing MP3 files. Total MP3 files found: {len(songs)}")
     return songs
 
-def list_mp3_files_parallel(folder, limit=None, max_workers=None):
-    """Lista arquivos MP3 usando processamento paralelo para maior velocidade."""
+def list_mp3_files_parallel(folder, limit=None, max_workers=None, recursive=True, error_log=None, known_failures=None):
+    """Lista arquivos MP3 usando processamento paralelo para maior velocidade.
+
+    Falhas vão para `error_log`; arquivos em `known_failures` que não mudaram são pulados.
+    """
     if max_workers is None:
         max_workers = parallel_workers
+    own_error_log = error_log is None
+    if own_error_log:
+        error_log = ScanErrorLog()
     
     print(f"Starting parallel MP3 file processing with {max_workers} workers...")
+    scheduler = resolve_scan_scheduler(folder)
+    device_workers = {}
     
-    # Fase 1: Coletar todos os arquivos MP3
-    print("Phase 1: Collecting MP3 files...")
-    mp3_files = []
-    total_files = 0
-    
-    for root, dirs, files in os.walk(folder):
-        for file in files:
-            if file.endswith(".mp3"):
-                mp3_files.append(os.path.join(root, file))
-            total_files += 1
-    
-    print(f"Found {len(mp3_files)} MP3 files out of {total_files} total files")
-    
-    if limit and limit < len(mp3_files):
-        original_count = len(mp3_files)
-        mp3_files = mp3_files[:limit]
-        print(f"⚠️  LIMIT APPLIED: Processing {len(mp3_files)} files (limited from {original_count} total MP3 files)")
+    if scheduler != "locality" and walk_workers > 1:
+        # Fases 1 e 2 juntas: várias pastas são listadas ao mesmo tempo e cada arquivo
+        # encontrado vai direto para a extração de tags (o agendador por localidade precisa da lista completa)
+        print(f"Phase 1: Listing up to {walk_workers} folders at a time, reading tags as files are found...")
+        
+        def discover_files():
+            found = skipped = 0
+            for file_path in walk_files(folder, walk_workers, recursive):
+                if limit and found >= limit:
+                    print(f"⚠️  LIMIT APPLIED: Processing the first {limit} MP3 files found")
+                    break
+                found += 1
+                if skip_known_failure(file_path, known_failures, error_log):
+                    skipped += 1
+                else:
+                    yield file_path, None
+            print(f"Found {found} MP3 files" + (f" ({skipped} unchanged files that failed before skipped)" if skipped else ""))
+        
+        scheduled_files = discover_files()
     else:
-        print(f"✅ Processing all {len(mp3_files)} MP3 files found (no limit applied)")
-    
-    if not mp3_files:
-        return []
+        # Fase 1: Coletar todos os arquivos MP3
+        print("Phase 1: Collecting MP3 files...")
+        mp3_files = []
+        total_files = 0
+        
+        for root, dirs, files in file_io.walk(folder):
+            for file in files:
+                if file.endswith(".mp3"):
+                    mp3_files.append(os.path.join(root, file))
+                total_files += 1
+            if not recursive:
+                break
+        
+        print(f"Found {len(mp3_files)} MP3 files out of {total_files} total files")
+        
+        if limit and limit < len(mp3_files):
+            original_count = len(mp3_files)
+            mp3_files = mp3_files[:limit]
+            print(f"⚠️  LIMIT APPLIED: Processing {len(mp3_files)} files (limited from {original_count} total MP3 files)")
+        else:
+            print(f"✅ Processing all {len(mp3_files)} MP3 files found (no limit applied)")
+        
+        mp3_files = split_known_failures(mp3_files, known_failures, error_log)
+        if not mp3_files:
+            return []
+        
+        # Fase 2: Processamento paralelo dos metadados
+        if scheduler == "locality":
+            # Leituras em ordem de diretório/inode, no máximo hdd_workers_per_device por disco
+            scheduled_files = order_files_for_locality(mp3_files)
+            devices = {device for _, device in scheduled_files}
+            device_workers = dict.fromkeys(devices, hdd_workers_per_device)
+            max_workers = hdd_workers_per_device * len(devices)
+        else:
+            scheduled_files = [(file_path, None) for file_path in mp3_files]
     
-    # Fase 2: Processamento paralelo dos metadados
-    print(f"Phase 2: Processing metadata in parallel with {max_workers} workers...")
+    tuner = None
+    if autotune_workers:
+        # O pool fica no tamanho máximo; o autotuner limita quantas leituras rodam ao mesmo tempo
+        tuner = WorkerAutotuner(folder, "scan", max_workers)
+        max_workers = max(max_workers, worker_tuning.max_workers)
+    print(f"Phase 2: Processing metadata in parallel with {tuner.workers if tuner else max_workers} workers ({scheduler} scheduler{', autotuned' if tuner else ''})...")
     songs = []
     completed = 0
     
     def process_single_file(file_path):
         """Processa um único arquivo MP3 e retorna seus metadados."""
+        if tuner:
+            tuner.acquire()
         try:
-            metadata = EasyID3(file_path)
-            artist = metadata.get("artist", ["Unknown"])[0]
-            title = metadata.get("title", ["Untitled"])[0]
-            artist = normalize_text(artist)
-            return {"path": file_path, "artist": artist, "title": title}
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-            return None
+            return read_metadata(file_path, error_log, tag_prefix_bytes)
+        finally:
+            if tuner:
+                tuner.release()
     
-    # Usar ThreadPoolExecutor para processamento paralelo
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submeter todas as tarefas
-        future_to_file = {executor.submit(process_single_file, file_path): file_path 
-                         for file_path in mp3_files}
+    # Com o agendador por localidade cada disco tem seu próprio pool (e sua fila em ordem de inode),
+    # então todos os discos são lidos ao mesmo tempo; senão há um único pool compartilhado
+    executors = {}
+    def submit(file_path, device):
+        executor = executors.get(device)
+        if executor is None:
+            executor = executors[device] = ThreadPoolExecutor(max_workers=device_workers.get(device, max_workers))
+        return executor.submit(process_single_file, file_path)
+    
+    try:
+        # Submeter todas as tarefas (na ordem do agendador; cada pool consome em FIFO)
+        future_to_file = {submit(file_path, device): file_path 
+                         for file_path, device in scheduled_files}
+        total = len(future_to_file)
         
         # Processar resultados conforme completam
         for future in as_completed(future_to_file):
@@ -289,24 +582,36 @@ def list_mp3_files_parallel(folder, limit=None, max_workers=None):
                 songs.append(result)
             
             completed += 1
-            if completed % 100 == 0 or completed == len(mp3_files):
-                print(f"Processed {completed}/{len(mp3_files)} files ({completed/len(mp3_files)*100:.1f}%)")
+            if completed % 100 == 0 or completed == total:
+                print(f"Processed {completed}/{total} files ({completed/total*100:.1f}%)")
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True)
     
+    if tuner:
+        tuner.finish()
+    if own_error_log:
+        error_log.summary()
     print(f"Parallel processing completed. Total songs processed: {len(songs)}")
     return songs
 
 # Function to group songs by "Artist"
 def group_by_artist(songs):
     print("Grouping songs by artist...")
+    if isinstance(songs, SnapshotSongs):
+        # Agrupa pelos ids inteiros do snapshot, sem montar os registros
+        groups = songs.group_by_artist()
+        print("Completed grouping by artist.")
+        return groups
+    # Agrupa pelo id do artista canônico ("The Beatles" e "Beatles, The" caem no mesmo grupo)
     groups = defaultdict(list)
     for song in songs:
-        artist = song["artist"]
-        groups[artist].append(song)
+        groups[song["artist_id"]].append(song)
     print("Completed grouping by artist.")
     return groups
 
 # Function to handle selection logic based on the number of songs per artist
-def select_songs_based_on_artist_count(groups_by_artist, songs_per_artist):
+def select_songs_based_on_artist_count(groups_by_artist, songs_per_artist, sample=random.sample):
     print("Selecting songs based on artist count...")
     selected_songs = []
 
@@ -316,7 +621,7 @@ def select_songs_based_on_artist_count(groups_by_artist, songs_per_artist):
 
     # For Group 1, select `songs_per_artist` songs per artist
     for artist, songs in group_1.items():
-        selected_songs.extend(random.sample(songs, songs_per_artist))
+        selected_songs.extend(sample(songs, min(songs_per_artist, len(songs))))
 
     # Calculate 10% of the total songs selected from Group 1
     total_group_1_songs = len(selected_songs)
@@ -324,14 +629,14 @@ def select_songs_based_on_artist_count(groups_by_artist, songs_per_artist):
 
     # Randomly select `group_2_selection_count` songs from Group 2 artists
     group_2_songs = [song for songs in group_2.values() for song in songs]
-    selected_songs.extend(random.sample(group_2_songs, min(group_2_selection_count, len(group_2_songs))))
+    selected_songs.extend(sample(group_2_songs, min(group_2_selection_count, len(group_2_songs))))
 
     print(f"Total songs selected: {len(selected_songs)} (Group 1: {total_group_1_songs}, Group 2: {group_2_selection_count})")
     return selected_songs
 
 # Function to limit songs based on the maximum size in bytes
 def limit_songs_by_size(selected_songs, max_size_bytes):
-    print(f"Limiting total size of selected songs to {max_size_gb} GB...")
+    print(f"Limiting total size of selected songs to {max_size_bytes / (1024 ** 3):g} GB...")
     limited_songs = []
     current_size = 0
 
@@ -339,7 +644,8 @@ def limit_songs_by_size(selected_songs, max_size_bytes):
     random.shuffle(selected_songs)
 
     for song in selected_songs:
-        file_size = os.path.getsize(song["path"])
+        # Tamanho do registro do cache (só lido do disco em caches antigos)
+        file_size = get_song_size(song)
         if current_size + file_size <= max_size_bytes:
             limited_songs.append(song)
             current_size += file_size
@@ -386,28 +692,50 @@ def copy_or_link_selected_songs(selected_songs, destination, copy_mode=True):
 
     print("Completed processing songs.")
 
-def copy_or_link_selected_songs_parallel(selected_songs, destination, copy_mode=True, max_workers=None):
-    """Copia ou cria atalhos para músicas selecionadas usando processamento paralelo."""
+def copy_or_link_selected_songs_parallel(selected_songs, destination, copy_mode=True, max_workers=None, executor=None, library_root=None):
+    """Copia ou cria atalhos para músicas selecionadas usando processamento paralelo.
+
+    Se `executor` for informado, as cópias são submetidas a esse pool compartilhado
+    (usado pelo modo servidor para limitar o I/O entre jobs simultâneos).
+    """
     if max_workers is None:
-        max_workers = parallel_workers
+        max_workers = executor._max_workers if executor else parallel_workers
+    tuner = None
+    if autotune_workers and executor is None:
+        tuner = WorkerAutotuner(library_root or music_folder, "copy", max_workers)
+        max_workers = max(max_workers, worker_tuning.max_workers)
+    active_workers = tuner.workers if tuner else max_workers
     
     if copy_mode:
-        print(f"Copying selected songs to destination folder (parallel with {max_workers} workers)...")
+        print(f"Copying selected songs to destination folder (parallel with {active_workers} workers)...")
     else:
-        print(f"Creating shortcuts for selected songs (parallel with {max_workers} workers)...")
+        print(f"Creating shortcuts for selected songs (parallel with {active_workers} workers)...")
 
     if not os.path.exists(destination):
         os.makedirs(destination)
 
+    # Progresso em bytes (tamanhos lidos antes de começar, para o ETA)
+    song_sizes = {}
+    if copy_mode:
+        for song in selected_songs:
+            try:
+                song_sizes[song["path"]] = get_song_size(song)
+            except OSError:
+                song_sizes[song["path"]] = 0
+    progress = CopyProgress(sum(song_sizes.values()))
+
     def process_single_song(song):
         """Processa uma única música (cópia ou atalho)."""
         source_path = song["path"]
         file_name = os.path.basename(source_path)
         destination_path = os.path.join(destination, file_name)
 
+        if tuner:
+            tuner.acquire()
+        copied_bytes = 0
         try:
             if copy_mode:
-                shutil.copy2(source_path, destination_path)
+                copied_bytes = copy_file_with_limits(source_path, destination_path, progress, copy_limits)
             else:
                 # Normalize path to handle special characters
                 source_path_normalized = normalize_path(source_path)
@@ -415,16 +743,24 @@ def copy_or_link_selected_songs_parallel(selected_songs, destination, copy_mode=
                 shortcut = shell.CreateShortcut(destination_path + ".lnk")
                 shortcut.TargetPath = source_path_normalized
                 shortcut.Save()
+                copied_bytes = 1  # Shortcuts are measured in files/s
             return True, file_name
         except Exception as e:
+            progress.skip(song_sizes.get(source_path, 0))
             return False, f"Failed to process {file_name}: {e}"
+        finally:
+            if tuner:
+                tuner.release(copied_bytes)
 
     # Usar ThreadPoolExecutor para processamento paralelo
     completed = 0
     successful = 0
     failed = 0
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
         # Submeter todas as tarefas
         future_to_song = {executor.submit(process_single_song, song): song 
                          for song in selected_songs}
@@ -441,30 +777,504 @@ def copy_or_link_selected_songs_parallel(selected_songs, destination, copy_mode=
                 print(result)
             
             if completed % 10 == 0 or completed == len(selected_songs):
-                print(f"Processed {completed}/{len(selected_songs)} songs ({completed/len(selected_songs)*100:.1f}%) - Success: {successful}, Failed: {failed}")
+                byte_progress = f" - {progress.format()}" if copy_mode else ""
+                print(f"Processed {completed}/{len(selected_songs)} songs ({completed/len(selected_songs)*100:.1f}%){byte_progress} - Success: {successful}, Failed: {failed}")
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+    if tuner:
+        tuner.finish()
+    if copy_mode:
+        # Usado pelo planejador para estimar a duração das próximas exportações
+        record_throughput(destination, progress.copied_bytes, time.monotonic() - progress.start_time)
 
     print(f"Parallel processing completed. Success: {successful}, Failed: {failed}")
+    return successful, failed
 
-# Execute the program
-print("Starting the song selection program...")
-songs = list_mp3_files_with_cache(music_folder, limit=test_limit)
+def export_selected_songs(selected_songs, destination, copy=True, archive=None, extra_destinations=()):
+    """Copia/cria atalhos ou, com `archive` ("tar"/"zip"), grava a seleção num único arquivo.
+
+    Com `extra_destinations`, as cópias vão para todos os destinos lendo cada música uma vez.
+    Retorna (sucessos, falhas); com destinos extras, {destino: (sucessos, falhas)}.
+    """
+    if extra_destinations and (archive or not copy):
+        print(f"Warning: extra destinations are only used for plain copies; "
+              f"{'the archive' if copy else 'the shortcuts'} will only be written to {destination}")
+    if copy and archive:
+        volume_size = archive_volume_mb * 1024 ** 2 if archive_volume_mb else None
+        return export_archive(selected_songs, destination, archive, volume_size,
+                              read_workers=parallel_workers, limits=copy_limits)
+    if copy and extra_destinations:
+        return export_fanout(selected_songs, [destination] + list(extra_destinations),
+                             read_workers=parallel_workers, limits=copy_limits, buffer_mb=fanout_buffer_mb)
+    return copy_or_link_selected_songs_parallel(selected_songs, destination, copy_mode=copy)
+
+def finish_selection(limited_songs, library_root):
+    """Exporta a seleção e registra no histórico, ou com plan_only apenas grava o plano."""
+    if plan_only:
+        plan = build_plan(limited_songs, library_root, destination_folder, copy_mode, archive_format)
+        print_plan(plan)
+        save_plan(plan, plan_file)
+        return
+    export_selected_songs(limited_songs, destination_folder, copy_mode, archive_format, extra_destination_folders)
+    record_export(library_root, limited_songs, destination_folder)
+
+def apply_export_plan(plan_path):
+    """Exporta exatamente as músicas de um plano salvo com plan_only, sem varredura nem seleção."""
+    plan, songs, changed = load_plan(plan_path)
+    print(f"Applying plan {plan_path} ({len(plan['songs'])} songs, created {time.ctime(plan['created'])})")
+    if changed:
+        print(f"{len(changed)} songs changed or disappeared since the plan was made and are skipped.")
+    destination = plan["destination"]
+    existing = set(plan["existing_files"])
+    songs = [song for song in songs if not (song["path"] in existing and is_already_copied(song, destination))]
+    if len(songs) < len(plan["songs"]) - len(changed):
+        print(f"{len(plan['songs']) - len(changed) - len(songs)} songs are already at the destination.")
+    if plan["copy_mode"]:
+        needed = sum(song["size"] for song in songs)
+        free_bytes = get_free_space(destination)
+        if needed > free_bytes:
+            print(f"Not enough space at {destination}: {needed / 1024 ** 3:.2f} GB needed, {free_bytes / 1024 ** 3:.2f} GB free.")
+            return
+    if songs:
+        export_selected_songs(songs, destination, plan["copy_mode"], plan["archive_format"])
+        record_export(plan["music_folder"], songs, destination)
+    else:
+        print("Nothing left to export.")
+
+# Low-memory mode: results are spilled to an append-only JSON Lines store
+def get_store_filename(music_folder):
+    """Nome estável do store JSON Lines da pasta de música."""
+    folder_hash = hashlib.md5(os.path.normpath(music_folder).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_folder, f"music_store_{folder_hash}.jsonl")
+
+def iter_mp3_files(folder, recursive=True):
+    """Gera os caminhos dos arquivos MP3 sem montar a lista inteira em memória."""
+    if walk_workers > 1:
+        yield from walk_files(folder, walk_workers, recursive)
+        return
+    for root, dirs, files in file_io.walk(folder):
+        for file in files:
+            if file.endswith(".mp3"):
+                yield os.path.join(root, file)
+        if not recursive:
+            break
+
+def get_current_rss_mb():
+    """Memória residente atual do processo em MB (None se indisponível)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 ** 2)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def scan_to_store(folder, limit=None, max_workers=None):
+    """Varre a pasta gravando cada resultado no store assim que chega; retorna (store_file, total)."""
+    if max_workers is None:
+        max_workers = parallel_workers
+    os.makedirs(cache_folder, exist_ok=True)
+    store_file = get_store_filename(folder)
+    window = low_memory_batch
+    submitted = 0
+    processed = 0
+    next_check = low_memory_batch
+    total = 0
+    # Lê as falhas do store anterior antes de sobrescrevê-lo
+    known_failures = load_store_failures(store_file) if use_cache and not force_rescan else {}
+    error_log = ScanErrorLog()
+
+    print(f"Low-memory scan with {max_workers} workers, writing to {store_file}...")
+    with open(store_file, 'w', encoding='utf-8') as store, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        header = {"music_folder": folder, "folder_mod_time": get_folder_modification_time(folder), "timestamp": time.time()}
+        store.write(json.dumps({"_header": header}, ensure_ascii=False) + "\n")
+
+        pending = set()
+        files = iter_mp3_files(folder)
+        while True:
+            # Mantém no máximo `window` arquivos em processamento
+            while len(pending) < window and not (limit and submitted >= limit):
+                file_path = next(files, None)
+                if file_path is None:
+                    break
+                if skip_known_failure(file_path, known_failures, error_log):
+                    continue
+                pending.add(executor.submit(read_metadata, file_path, error_log))
+                submitted += 1
+            if not pending:
+                break
+
+            # wait() acompanha a janela inteira de uma vez (as_completed por arquivo custaria O(janela) cada)
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                song = future.result()
+                if song:
+                    store.write(json.dumps(song, ensure_ascii=False) + "\n")
+                    total += 1
+            processed += len(done)
+
+            if processed >= next_check:
+                next_check += low_memory_batch
+                rss = get_current_rss_mb()
+                if rss and rss > low_memory_max_rss_mb and window > 16:
+                    window = max(16, window // 2)
+                    gc.collect()
+                    print(f"RSS {rss:.0f} MB above {low_memory_max_rss_mb} MB, in-flight window reduced to {window}")
+                print(f"Processed {processed} files, {total} songs stored")
+
+        for failure in error_log.failures:
+            store.write(json.dumps({"_failure": failure}, ensure_ascii=False) + "\n")
+        store.write(json.dumps({"_footer": {"total_songs": total}}) + "\n")
+
+    error_log.summary()
+    print(f"Low-memory scan completed. Total songs stored: {total}")
+    return store_file, total
+
+def iter_store_songs(store_file):
+    """Gera (offset, song) para cada música do store, lendo linha a linha."""
+    with open(store_file, 'rb') as store:
+        offset = store.tell()
+        for line in store:
+            record = json.loads(line)
+            if "path" in record:
+                yield offset, record
+            offset += len(line)
+
+def load_store_failures(store_file):
+    """Falhas registradas num store (completo ou não), indexadas por caminho."""
+    failures = []
+    try:
+        with open(store_file, 'rb') as store:
+            for line in store:
+                if line.startswith(b'{"_failure"'):
+                    failures.append(json.loads(line)["_failure"])
+    except (OSError, ValueError):
+        pass
+    return index_failures(failures)
+
+def load_store(music_folder):
+    """Retorna o store da pasta se estiver completo e válido, senão None."""
+    store_file = get_store_filename(music_folder)
+    if not os.path.exists(store_file):
+        print("No low-memory store found for this folder.")
+        return None
+    try:
+        with open(store_file, 'rb') as store:
+            header = json.loads(store.readline()).get("_header", {})
+            store.seek(0, os.SEEK_END)
+            # A última linha é o rodapé; sem ela o store está incompleto (varredura interrompida)
+            store.seek(max(0, store.tell() - 4096))
+            footer = json.loads(store.read().splitlines()[-1]).get("_footer")
+        if not footer or header.get("music_folder") != music_folder:
+            print("Low-memory store is incomplete or for a different folder.")
+            return None
+        if get_folder_modification_time(music_folder) > header.get("folder_mod_time", 0):
+            print("Music folder has been modified since the store was written.")
+            return None
+        print("Checking store integrity...")
+        for _, song in iter_store_songs(store_file):
+            if not file_io.exists(song["path"]):
+                print(f"Store invalid: {song['path']} no longer exists.")
+                return None
+    except Exception as e:
+        print(f"Error loading low-memory store: {e}")
+        return None
+    print(f"Low-memory store loaded: {footer['total_songs']} songs")
+    return store_file
+
+def build_store_artist_index(store_file, conditions=None, recent_ids=()):
+    """Índice id do artista -> offsets no store (arrays de inteiros em vez de dicts), já filtrado.
+
+    Retorna também os offsets das músicas cujo id está em `recent_ids` (exportadas recentemente),
+    para a rotação trabalhar sobre offsets sem guardar o id de cada música.
+    """
+    index = defaultdict(lambda: array('q'))
+    recent_offsets = set()
+    for offset, song in iter_store_songs(store_file):
+        if conditions and not song_matches(song, conditions):
+            continue
+        # O nome gravado já é canônico e não pode ser resolvido de novo ("The A Team" -> "a team" -> "team");
+        # só stores gravados antes dos artistas canônicos não têm artist_id
+        artist_key = song["artist_id"] if "artist_id" in song else resolve_artist(song["artist"])[1]
+        index[artist_key].append(offset)
+        if recent_ids and get_song_id(song) in recent_ids:
+            recent_offsets.add(offset)
+    return index, recent_offsets
+
+def read_store_songs(store_file, offsets):
+    """Lê do store apenas as músicas nos offsets indicados."""
+    songs = []
+    with open(store_file, 'rb') as store:
+        for offset in sorted(offsets):
+            store.seek(offset)
+            songs.append(json.loads(store.readline()))
+    return songs
+
+def save_cache_from_store(store_file, music_folder, total):
+    """Grava o cache JSON normal a partir do store, sem montar a lista de músicas em memória."""
+    with open(store_file, 'rb') as store:
+        header = json.loads(store.readline())["_header"]
+    cache_file = get_cache_filename(music_folder)
+    with atomic_write(cache_file) as f:
+        f.write('{\n')
+        f.write(f'  "version": {CACHE_VERSION},\n')
+        f.write(f'  "timestamp": {json.dumps(header["timestamp"])},\n')
+        f.write(f'  "music_folder": {json.dumps(music_folder, ensure_ascii=False)},\n')
+        f.write(f'  "folder_mod_time": {json.dumps(header["folder_mod_time"])},\n')
+        f.write(f'  "total_songs": {total},\n')
+        f.write(f'  "failures": {json.dumps(list(load_store_failures(store_file).values()), ensure_ascii=False)},\n')
+        f.write('  "songs": [')
+        for i, (_, song) in enumerate(iter_store_songs(store_file)):
+            f.write(("," if i else "") + "\n    " + json.dumps(song, ensure_ascii=False))
+        f.write('\n  ]\n}\n')
+    print(f"Cache salvo a partir do store: {cache_file}")
+
+def run_selection_low_memory():
+    """Seleção completa sem carregar a biblioteca inteira em memória."""
+    print("Starting the song selection program (low-memory mode)...")
+    store_file = None
+    if use_cache and not force_rescan:
+        store_file = load_store(music_folder)
+    if not store_file:
+        store_file, total = scan_to_store(music_folder, limit=test_limit)
+        if use_cache and total:
+            save_cache_from_store(store_file, music_folder, total)
+
+    recent_ids = recent_song_ids(music_folder, rotation_runs) if rotation_mode else set()
+    offsets_by_artist, recent_offsets = build_store_artist_index(store_file, parse_filter_expression(filter_expression), recent_ids)
+    if not offsets_by_artist:
+        print("No MP3 files found in the specified folder.")
+        return
+    print(f"Number of artists found: {len(offsets_by_artist)}")
+
+    # A regra de seleção é a mesma; ela só trabalha sobre offsets em vez de dicts
+    sample = random.sample
+    if rotation_mode:
+        print(f"Rotation ({rotation_mode}): {len(recent_ids)} songs exported in the last {rotation_runs} runs")
+        # Os próprios offsets servem de chave: só os das músicas recentes ficam em memória
+        sample = make_rotation_sampler(recent_offsets, rotation_mode, rotation_weight, ids_of=lambda offsets: offsets)
+    selected_offsets = select_songs_based_on_artist_count(offsets_by_artist, songs_per_artist, sample)
+    selected_songs = read_store_songs(store_file, selected_offsets)
 
-if songs:
-    print(f"Total MP3 files found: {len(songs)}")
-    groups_by_artist = group_by_artist(songs)
-    selected_songs = select_songs_based_on_artist_count(groups_by_artist, songs_per_artist)
-    
-    # If in copy mode, limit by size; otherwise, proceed without size limitation
     if copy_mode:
         limited_songs = limit_songs_by_size(selected_songs, max_size_bytes)
     else:
-        limited_songs = selected_songs  # Ignore size limitation for shortcut creation
-    
+        limited_songs = selected_songs
+
     if limited_songs:
-        copy_or_link_selected_songs_parallel(limited_songs, destination_folder, copy_mode=copy_mode)
+        finish_selection(limited_songs, music_folder)
     else:
         print("No songs selected within the size limit. Exiting program.")
-else:
-    print("No MP3 files found in the specified folder.")
 
-print("Program completed successfully.")
+# Selection server: keeps the library and the artist index in memory between jobs
+server_state = {
+    "library": None,        # {"songs", "groups", "loaded_at"}
+    "jobs": {},             # job_id -> job dict
+    "lock": threading.Lock(),
+    "job_executor": None,   # runs selection jobs (server_job_workers)
+    "io_executor": None,    # shared copy pool (server_io_workers)
+}
+
+def load_library(folder):
+    """Carrega a biblioteca (cache ou varredura) e monta o índice por artista uma única vez."""
+    songs = list_mp3_files_with_cache(folder, limit=test_limit)
+    library = {
+        "folder": folder,
+        "songs": songs,
+        "groups": group_by_artist(songs),
+        "indexes": build_indexes(songs),
+        "loaded_at": time.time(),
+    }
+    with server_state["lock"]:
+        server_state["library"] = library
+    return library
+
+def run_selection_job(job):
+    """Executa um job de seleção/exportação contra a biblioteca em memória."""
+    params = job["params"]
+    with server_state["lock"]:
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        library = server_state["library"]
+
+    try:
+        groups = library["groups"]
+        if params["filter"]:
+            groups = group_by_artist(filter_songs(library["songs"], params["filter"], library["indexes"]))
+        sample = random.sample
+        if params["rotation"]:
+            sample = make_rotation_sampler(recent_song_ids(library["folder"], rotation_runs), params["rotation"], rotation_weight)
+        selected = select_songs_based_on_artist_count(groups, params["songs_per_artist"], sample)
+        if params["copy_mode"]:
+            selected = limit_songs_by_size(selected, params["max_size_gb"] * (1024 ** 3))
+        successful, failed = 0, 0
+        if selected:
+            successful, failed = copy_or_link_selected_songs_parallel(
+                selected, params["destination"], copy_mode=params["copy_mode"],
+                executor=server_state["io_executor"])
+            record_export(library["folder"], selected, params["destination"])
+        result = {"selected": len(selected), "successful": successful, "failed": failed}
+        status = "done"
+    except Exception as e:
+        result = {"error": str(e)}
+        status = "failed"
+
+    with server_state["lock"]:
+        job["status"] = status
+        job["result"] = result
+        job["finished_at"] = time.time()
+
+def submit_selection_job(params):
+    """Valida os parâmetros, enfileira o job e devolve seu id."""
+    if not isinstance(params, dict):
+        raise ValueError("The request body must be a JSON object")
+    if not params.get("destination"):
+        raise ValueError("'destination' is required")
+    parse_filter_expression(params.get("filter", ""))  # Rejeita filtros inválidos antes de enfileirar
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "params": {
+            "destination": params["destination"],
+            "songs_per_artist": int(params.get("songs_per_artist", songs_per_artist)),
+            "max_size_gb": float(params.get("max_size_gb", max_size_gb)),
+            "copy_mode": bool(params.get("copy_mode", copy_mode)),
+            "filter": params.get("filter", filter_expression),
+            "rotation": params.get("rotation", rotation_mode),
+        },
+        "submitted_at": time.time(),
+        "result": None,
+    }
+    with server_state["lock"]:
+        server_state["jobs"][job["id"]] = job
+    server_state["job_executor"].submit(run_selection_job, job)
+    return job["id"]
+
+class SelectionRequestHandler(BaseHTTPRequestHandler):
+    """HTTP endpoints: POST /jobs, GET /jobs, GET /jobs/<id>, GET /status, POST /reload."""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def do_GET(self):
+        with server_state["lock"]:
+            library = server_state["library"]
+            # Cópias: run_selection_job altera os jobs enquanto a resposta é serializada
+            jobs = {job_id: dict(job) for job_id, job in server_state["jobs"].items()}
+        if self.path == "/status":
+            counts = defaultdict(int)
+            for job in jobs.values():
+                counts[job["status"]] += 1
+            self._send_json(200, {
+                "music_folder": library["folder"],
+                "total_songs": len(library["songs"]),
+                "total_artists": len(library["groups"]),
+                "loaded_at": library["loaded_at"],
+                "jobs": counts,
+            })
+        elif self.path == "/jobs":
+            self._send_json(200, [{"id": job["id"], "status": job["status"]} for job in jobs.values()])
+        elif self.path.startswith("/jobs/"):
+            job = jobs.get(self.path[len("/jobs/"):])
+            if job:
+                self._send_json(200, job)
+            else:
+                self._send_json(404, {"error": "job not found"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            if self.path == "/jobs":
+                job_id = submit_selection_job(self._read_json())
+                self._send_json(202, {"id": job_id, "status": "queued"})
+            elif self.path == "/reload":
+                library = load_library(server_state["library"]["folder"])
+                self._send_json(200, {"total_songs": len(library["songs"])})
+            else:
+                self._send_json(404, {"error": "not found"})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        print(f"[server] {self.address_string()} - {format % args}")
+
+def run_selection_server(folder, host=None, port=None):
+    """Carrega a biblioteca uma vez e atende jobs de seleção até ser interrompido."""
+    host = host or server_host
+    port = port or server_port
+
+    library = load_library(folder)
+    print(f"Library loaded: {len(library['songs'])} songs, {len(library['groups'])} artists")
+
+    server_state["job_executor"] = ThreadPoolExecutor(max_workers=server_job_workers)
+    server_state["io_executor"] = ThreadPoolExecutor(max_workers=server_io_workers)
+    httpd = ThreadingHTTPServer((host, port), SelectionRequestHandler)
+    print(f"Selection server listening on http://{host}:{port} "
+          f"({server_job_workers} job workers, {server_io_workers} I/O workers)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping selection server...")
+    finally:
+        httpd.server_close()
+        server_state["job_executor"].shutdown(wait=True)
+        server_state["io_executor"].shutdown(wait=True)
+
+def run_selection():
+    """Executa uma seleção completa: varredura/cache, seleção e cópia."""
+    print("Starting the song selection program...")
+    songs = list_mp3_files_with_cache(music_folder, limit=test_limit)
+    if songs and filter_expression:
+        songs = filter_songs(songs, filter_expression, loaded_indexes)
+
+    if songs:
+        print(f"Total MP3 files found: {len(songs)}")
+        groups_by_artist = group_by_artist(songs)
+        sample = random.sample
+        if rotation_mode:
+            recent_ids = recent_song_ids(music_folder, rotation_runs)
+            print(f"Rotation ({rotation_mode}): {len(recent_ids)} songs exported in the last {rotation_runs} runs")
+            sample = make_rotation_sampler(recent_ids, rotation_mode, rotation_weight)
+        selected_songs = select_songs_based_on_artist_count(groups_by_artist, songs_per_artist, sample)
+        
+        # If in copy mode, limit by size; otherwise, proceed without size limitation
+        if copy_mode:
+            limited_songs = limit_songs_by_size(selected_songs, max_size_bytes)
+        else:
+            limited_songs = selected_songs  # Ignore size limitation for shortcut creation
+        
+        if limited_songs:
+            finish_selection(limited_songs, music_folder)
+        else:
+            print("No songs selected within the size limit. Exiting program.")
+    else:
+        print("No MP3 files found in the specified folder.")
+
+# Execute the program
+if __name__ == "__main__":
+    if scan_shard_only:
+        print(f"Scanning single shard: {scan_shard_only}")
+        scan_shard(scan_shard_only)
+    elif apply_plan_file:
+        apply_export_plan(apply_plan_file)
+    elif server_mode:
+        print("Starting the song selection server...")
+        run_selection_server(music_folder)
+    elif low_memory_scan:
+        run_selection_low_memory()
+    else:
+        run_selection()
+
+    print("Program completed successfully.")
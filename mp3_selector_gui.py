@@ -1,89 +1,33 @@
 import os
-import shutil
 import threading
-import json
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tkinter import Tk, Label, Entry, Button, StringVar, IntVar, filedialog, messagebox, Radiobutton, Frame, ttk, Checkbutton
-from mutagen.easyid3 import EasyID3
 from collections import defaultdict
+import file_io
+import worker_tuning
+from worker_tuning import WorkerAutotuner
+from transfer import CopyProgress, create_copy_limits, copy_file_with_limits
+from library_index import filter_songs
+from selection_history import get_song_id, recent_song_ids, record_export
+from music_cache import (find_cache_file, get_cache_filename, get_folder_modification_time, load_cache_data,
+                         read_song_record, save_cache_data)
+from scan_errors import ScanErrorLog, index_failures, split_known_failures
+from parallel_walk import walk_files
 
 # Variável global para controlar a interrupção do processo
 stop_flag = False
 
-# Cache management functions
-def get_cache_filename(music_folder):
-    """Gera nome único do arquivo de cache baseado na pasta de música."""
-    # Pasta cache na raiz do projeto
-    cache_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
-    folder_hash = abs(hash(music_folder)) % (10 ** 8)
-    return os.path.join(cache_folder, f"music_cache_{folder_hash}.json")
+# Secondary indexes of the last cache loaded, used by the filter
+loaded_indexes = None
 
-def get_folder_modification_time(folder):
-    """Obtém o tempo de modificação mais recente da pasta e subpastas."""
+# Cache management functions (file name, schema, locking and atomic writes are shared with the CLI)
+def save_cache(songs, music_folder, failures=None):
+    """Salva a lista de músicas (e os arquivos ilegíveis) no cache."""
     try:
-        latest_time = 0
-        for root, dirs, files in os.walk(folder):
-            folder_time = os.path.getmtime(root)
-            if folder_time > latest_time:
-                latest_time = folder_time
-            for file in files:
-                if file.lower().endswith('.mp3'):
-                    file_path = os.path.join(root, file)
-                    try:
-                        file_time = os.path.getmtime(file_path)
-                        if file_time > latest_time:
-                            latest_time = file_time
-                    except:
-                        continue
-        return latest_time
-    except Exception as e:
-        print(f"Erro ao obter tempo de modificação: {e}")
-        return 0
-
-def save_cache(songs, music_folder):
-    """Salva a lista de músicas no cache."""
-    try:
-        print(f"=== DEBUG SAVE_CACHE ===")
-        print(f"music_folder: {music_folder}")
-        print(f"len(songs): {len(songs)}")
-        
-        # Pasta cache na raiz do projeto
-        cache_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
-        print(f"cache_folder: {cache_folder}")
-        
-        if not os.path.exists(cache_folder):
-            print("Creating cache folder...")
-            os.makedirs(cache_folder)
-            print("Cache folder created!")
-        else:
-            print("Cache folder already exists!")
-        
-        cache_data = {
-            "timestamp": time.time(),
-            "music_folder": music_folder,
-            "folder_mod_time": get_folder_modification_time(music_folder),
-            "songs": songs,
-            "total_songs": len(songs)
-        }
-        
-        cache_file = get_cache_filename(music_folder)
-        print(f"cache_file: {cache_file}")
-        
-        print("Writing cache file...")
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, ensure_ascii=False, indent=2)
-        
+        cache_file = save_cache_data(songs, music_folder, failures)
         print(f"✅ Cache salvo com sucesso: {cache_file}")
         print(f"Total de músicas em cache: {len(songs)}")
-        
-        # Verify if file was actually created
-        if os.path.exists(cache_file):
-            file_size = os.path.getsize(cache_file)
-            print(f"File created successfully! Size: {file_size} bytes")
-        else:
-            print("❌ ERROR: File was not created!")
-        
         return True
     except Exception as e:
         print(f"❌ Erro ao salvar cache: {e}")
@@ -93,24 +37,29 @@ def save_cache(songs, music_folder):
 
 def load_cache(music_folder, manual_path=None):
     """Loads the music list from cache if available and valid."""
+    global loaded_indexes
+    loaded_indexes = None  # Until this cache is accepted, no indexes match the songs in use
     try:
         if manual_path and os.path.exists(manual_path):
             cache_file = manual_path
             print(f"Using manual cache file: {cache_file}")
         else:
-            cache_file = get_cache_filename(music_folder)
+            cache_file = find_cache_file(music_folder)
         
-        if not os.path.exists(cache_file):
+        if not cache_file:
             print("Cache file not found.")
             return None
         
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
+        # Older caches (lowercased artists, no ids) are upgraded to the current schema
+        cache_data = load_cache_data(cache_file)
+        if cache_data is None:
+            print("Cache file is invalid.")
+            return None
         
         # Se NÃO for manual, faz as validações automáticas de pasta e tempo
         if not manual_path:
             # Verify if cache is for the same folder
-            if cache_data.get("music_folder") != music_folder:
+            if os.path.normpath(cache_data.get("music_folder", "")) != os.path.normpath(music_folder):
                 print("Cache is for a different folder.")
                 return None
             
@@ -130,7 +79,7 @@ def load_cache(music_folder, manual_path=None):
         
         print("Checking cache integrity...")
         for song in songs:
-            if os.path.exists(song["path"]):
+            if file_io.exists(song["path"]):
                 valid_songs.append(song)
         
         if len(valid_songs) != len(songs):
@@ -138,6 +87,12 @@ def load_cache(music_folder, manual_path=None):
             if not manual_path: # If automatic, invalidate. If manual, use what's left.
                 return None
         
+        if len(valid_songs) == len(songs):
+            # The indexes are positions in the cached list: only usable while it is complete
+            loaded_indexes = cache_data.get("indexes")
+        if not manual_path and cache_file != get_cache_filename(music_folder):
+            # Cache from an older version: rewritten with the current schema and name
+            save_cache(valid_songs, music_folder, cache_data.get("failures"))
         cache_age = time.time() - cache_data.get("timestamp", 0)
         print(f"Cache loaded successfully!")
         print(f"Cache date: {time.ctime(cache_data.get('timestamp', 0))}")
@@ -150,11 +105,17 @@ def load_cache(music_folder, manual_path=None):
         print(f"Error loading cache: {e}")
         return None
 
+def load_cached_failures(music_folder):
+    """Returns the files that failed in the last scan, even if the cache itself is outdated."""
+    cache_file = find_cache_file(music_folder)
+    cache_data = load_cache_data(cache_file) if cache_file else None
+    return index_failures(cache_data.get("failures")) if cache_data else {}
+
 def count_folders_and_files(folder_path):
     """Conta o número total de pastas e arquivos em uma pasta especificada."""
     total_folders = 0
     total_files = 0
-    for _, dirs, files in os.walk(folder_path):
+    for _, dirs, files in file_io.walk(folder_path):
         total_folders += len(dirs)
         total_files += len(files)
     return total_folders, total_files
@@ -168,7 +129,7 @@ def list_mp3_files(folder_path, progress_var, status_label, root, limit=None):
     processed_folders = 0
     processed_files = 0
 
-    for root_dir, _, files in os.walk(folder_path):
+    for root_dir, _, files in file_io.walk(folder_path):
         if stop_flag:
             break
         for file in files:
@@ -189,31 +150,28 @@ def list_mp3_files(folder_path, progress_var, status_label, root, limit=None):
     print(f"Número de arquivos MP3 encontrados: {len(mp3_files)}")
     return mp3_files
 
-def list_mp3_files_parallel(folder_path, progress_var, status_label, root, limit=None, max_workers=20):
+def list_mp3_files_parallel(folder_path, progress_var, status_label, root, limit=None, max_workers=10, autotune=False,
+                            error_log=None, known_failures=None):
     """Lista todos os arquivos MP3 em uma pasta especificada usando paralelização."""
     global stop_flag
+    if error_log is None:
+        error_log = ScanErrorLog()
     print(f"Listing MP3 files in folder (PARALLEL): {folder_path}")
     
     # Phase 1: Collecting MP3 files
     mp3_files = []
-    processed_files = 0
     print("Phase 1: Collecting MP3 files...")
     
-    # Combined walk to avoid double scanning disk
-    for root_dir, _, files in os.walk(folder_path):
+    # Folders are listed concurrently (each listing is a round trip on network shares)
+    for file_path in walk_files(folder_path, match=lambda name: name.lower().endswith('.mp3')):
         if stop_flag:
             break
-        for file in files:
-            if stop_flag:
-                break
-            if file.lower().endswith('.mp3'):
-                mp3_files.append(os.path.join(root_dir, file))
-            
-            processed_files += 1
-            # Update UI only every 1000 files to avoid overhead
-            if processed_files % 1000 == 0:
-                status_label.config(text=f"Searching... {len(mp3_files)} MP3s found ({processed_files} total files)")
-                root.update_idletasks()
+        mp3_files.append(file_path)
+        
+        # Update UI only every 1000 files to avoid overhead
+        if len(mp3_files) % 1000 == 0:
+            status_label.config(text=f"Searching... {len(mp3_files)} MP3s found")
+            root.update_idletasks()
 
     if stop_flag:
         return []
@@ -222,12 +180,19 @@ def list_mp3_files_parallel(folder_path, progress_var, status_label, root, limit
         mp3_files = mp3_files[:limit]
     
     print(f"MP3 files found: {len(mp3_files)}")
+    # Unchanged files that failed in a previous scan are not read again
+    mp3_files = split_known_failures(mp3_files, known_failures, error_log)
     
     if not mp3_files:
         return mp3_files
 
     # Phase 2: Parallel processing of metadata
-    print("Phase 2: Processing metadata in parallel...")
+    tuner = None
+    if autotune:
+        # Pool at full size; the autotuner limits how many reads run at once
+        tuner = WorkerAutotuner(folder_path, "scan", max_workers)
+        max_workers = max(max_workers, worker_tuning.max_workers)
+    print(f"Phase 2: Processing metadata in parallel with {tuner.workers if tuner else max_workers} workers...")
     songs_with_metadata = []
     completed = 0
     
@@ -235,22 +200,18 @@ def list_mp3_files_parallel(folder_path, progress_var, status_label, root, limit
         """Processa um único arquivo MP3 e retorna seus metadados."""
         if stop_flag:
             return None
+        if tuner:
+            tuner.acquire()
         try:
-            audio = EasyID3(file_path)
-            artist = audio.get('artist', ['Unknown'])[0]
-            title = audio.get('title', ['Untitled'])[0]
-            return {
-                "path": file_path,
-                "artist": artist.lower(),
-                "title": title
-            }
+            # Same record as the CLI (tags and stream info in a single read)
+            return read_song_record(file_path)
         except Exception as e:
-            print(f"Erro ao processar {file_path}: {e}")
-            return {
-                "path": file_path,
-                "artist": "unknown",
-                "title": "untitled"
-            }
+            # Recorded in the cache as a failure instead of an "unknown" song
+            error_log.record(file_path, e)
+            return None
+        finally:
+            if tuner:
+                tuner.release()
     
     # Usar ThreadPoolExecutor para processamento paralelo
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -275,17 +236,15 @@ def list_mp3_files_parallel(folder_path, progress_var, status_label, root, limit
                 status_label.config(text=f"Processing metadata... ({completed}/{len(mp3_files)})")
                 root.update_idletasks()
     
+    if tuner:
+        tuner.finish()
     print(f"Parallel processing complete: {len(songs_with_metadata)} files processed")
     return songs_with_metadata
 
 def list_mp3_files_with_cache(folder_path, progress_var, status_label, root, limit=None):
     """Lista arquivos MP3 usando cache quando possível."""
-    global stop_flag
-    
-    print(f"=== DEBUG CACHE ===")
-    print(f"use_cache.get(): {use_cache.get()}")
-    print(f"force_rescan.get(): {force_rescan.get()}")
-    print(f"folder_path: {folder_path}")
+    global stop_flag, loaded_indexes
+    loaded_indexes = None  # Set again only if a cache is loaded below
     
     # Tenta carregar do cache primeiro
     if use_cache.get() and not force_rescan.get():
@@ -301,6 +260,7 @@ def list_mp3_files_with_cache(folder_path, progress_var, status_label, root, lim
             mp3_files_with_metadata = cached_songs
             if limit:
                 mp3_files_with_metadata = mp3_files_with_metadata[:limit]
+                loaded_indexes = None
             progress_var.set(100)
             status_label.config(text=f"Cache loaded: {len(mp3_files_with_metadata)} files")
             root.update_idletasks()
@@ -313,13 +273,18 @@ def list_mp3_files_with_cache(folder_path, progress_var, status_label, root, lim
     # If no valid cache, perform full scan
     status_label.config(text="Performing full scan...")
     root.update_idletasks()
+    known_failures = load_cached_failures(folder_path) if use_cache.get() and not force_rescan.get() else {}
+    error_log = ScanErrorLog()
     # Now it returns the full objects with metadata
-    songs_with_metadata = list_mp3_files_parallel(folder_path, progress_var, status_label, root, limit)
+    songs_with_metadata = list_mp3_files_parallel(folder_path, progress_var, status_label, root, limit,
+                                                  max_workers=parallel_workers.get(), autotune=autotune_workers.get() == 1,
+                                                  error_log=error_log, known_failures=known_failures)
+    error_log.summary()
     
     # Saves to cache for next runs (now it's instant because we already have the metadata!)
     if songs_with_metadata and (use_cache.get() or only_cache.get()):
         print(f"Saving {len(songs_with_metadata)} songs to cache...")
-        save_cache(songs_with_metadata, folder_path)
+        save_cache(songs_with_metadata, folder_path, error_log.failures)
     else:
         print("Cache disabled or no songs found, not saving cache.")
     
@@ -332,19 +297,21 @@ def group_by_artist(songs_with_metadata):
     for song in songs_with_metadata:
         if stop_flag:
             break
-        # Use the artist already present in the metadata
-        artist = song.get('artist', 'unknown')
-        groups[artist].append(song)
+        # Canonical artist id from the metadata ("The Beatles" / "Beatles, The" are one artist)
+        groups[song['artist_id']].append(song)
     print(f"Number of artists found: {len(groups)}")
     return groups
 
-def select_songs_based_on_artist_count(groups_by_artist, songs_per_artist):
-    """Selects a specific number of songs per artist."""
+def select_songs_based_on_artist_count(groups_by_artist, songs_per_artist, recent_ids=None):
+    """Selects a specific number of songs per artist, preferring songs not in `recent_ids`."""
     print(f"Selecting up to {songs_per_artist} songs per artist...")
     selected_songs = []
     for artist, songs in groups_by_artist.items():
         if stop_flag:
             break
+        if recent_ids:
+            # Stable sort: songs exported recently go to the end of the artist's list
+            songs = sorted(songs, key=lambda song: get_song_id(song) in recent_ids)
         selected_songs.extend(songs[:songs_per_artist])
     print(f"Number of songs selected: {len(selected_songs)}")
     return selected_songs
@@ -360,7 +327,7 @@ def limit_songs_by_size(selected_songs, max_size_bytes):
         # Get path from song dictionary
         file_path = song["path"]
         try:
-            song_size = os.path.getsize(file_path)
+            song_size = file_io.getsize(file_path)
             if total_size + song_size <= max_size_bytes:
                 limited_songs.append(song)
                 total_size += song_size
@@ -371,25 +338,73 @@ def limit_songs_by_size(selected_songs, max_size_bytes):
     print(f"Number of songs after size limitation: {len(limited_songs)}")
     return limited_songs
 
-def copy_or_link_selected_songs(songs, destination_folder, progress_var, status_label, root, copy_mode=True):
+def copy_or_link_selected_songs(songs, destination_folder, progress_var, status_label, root, copy_mode=True, max_workers=10, autotune=False, library_root=None,
+                                bandwidth_mb_s=None, max_iops=None):
     """Copia ou cria atalhos para as músicas selecionadas na pasta de destino."""
     global stop_flag
     print(f"{'Copiando' if copy_mode else 'Criando atalhos para'} músicas na pasta de destino: {destination_folder}")
     if not os.path.exists(destination_folder):
         os.makedirs(destination_folder)
     total_songs = len(songs)
-    for i, song in enumerate(songs):
+    # Byte-level progress and limits shared by all copy workers
+    song_sizes = {}
+    if copy_mode:
+        for song in songs:
+            try:
+                song_sizes[song["path"]] = file_io.getsize(song["path"])
+            except OSError:
+                song_sizes[song["path"]] = 0
+    progress = CopyProgress(sum(song_sizes.values()))
+    limits = create_copy_limits(bandwidth_mb_s, max_iops)
+    tuner = None
+    if autotune:
+        tuner = WorkerAutotuner(library_root or destination_folder, "copy", max_workers)
+        max_workers = max(max_workers, worker_tuning.max_workers)
+
+    def process_single_song(song):
+        """Copia (ou cria o link de) uma única música; retorna os bytes copiados."""
         if stop_flag:
-            break
-        file_path = song["path"]
-        destination_path = os.path.join(destination_folder, os.path.basename(file_path))
-        if copy_mode:
-            shutil.copy2(file_path, destination_path)
-        else:
-            os.symlink(file_path, destination_path)
-        progress_var.set((i + 1) / total_songs * 100)
-        status_label.config(text=f"Processing {i + 1} of {total_songs} songs...")
-        root.update_idletasks()  # Forces update of the GUI
+            return 0
+        if tuner:
+            tuner.acquire()
+        copied_bytes = 0
+        try:
+            file_path = song["path"]
+            destination_path = os.path.join(destination_folder, os.path.basename(file_path))
+            if copy_mode:
+                copied_bytes = copy_file_with_limits(file_path, destination_path, progress, limits,
+                                                     should_stop=lambda: stop_flag)
+            else:
+                os.symlink(file_path, destination_path)
+                copied_bytes = 1  # Links are measured in files/s
+            return copied_bytes
+        except Exception:
+            progress.skip(song_sizes.get(song["path"], 0))
+            raise
+        finally:
+            if tuner:
+                tuner.release(copied_bytes)
+
+    completed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_single_song, song) for song in songs]
+        for future in as_completed(futures):
+            if stop_flag:
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
+            future.result()
+            completed += 1
+            if copy_mode and progress.total_bytes:
+                progress_var.set(progress.copied_bytes / progress.total_bytes * 100)
+                status_label.config(text=f"Copied {completed} of {total_songs} songs - {progress.format()}")
+            else:
+                progress_var.set(completed / total_songs * 100)
+                status_label.config(text=f"Processing {completed} of {total_songs} songs...")
+            root.update_idletasks()  # Forces update of the GUI
+    if tuner:
+        tuner.finish()
+    if copy_mode:
+        print(f"Copied: {progress.format()}")
     print("Copy/link process completed.")
     status_label.config(text="Process completed.")
 
@@ -426,6 +441,9 @@ def start_process(root):
         print(f"Songs per artist: {songs_per_artist_value}")
         print(f"Max size (GB): {max_size_gb_value}")
         print(f"Copy mode: {'Copy' if copy_mode_value else 'Create Shortcuts'}")
+        print(f"Parallel workers: {parallel_workers.get()}{' (auto-tuned)' if autotune_workers.get() else ''}")
+        filter_value = filter_expression.get().strip()
+        print(f"Filter: {filter_value or '(none)'}")
 
         # Step 1: Scanning MP3 files
         status_label.config(text="Starting MP3 file scan...")
@@ -447,12 +465,21 @@ def start_process(root):
                 messagebox.showwarning("Warning", "No MP3 files found to cache.")
                 return
 
+        if songs and filter_value:
+            status_label.config(text="Filtering songs...")
+            root.update_idletasks()
+            songs = filter_songs(songs, filter_value, loaded_indexes)
+
         if songs:
             # Step 2: Grouping and selecting songs
             status_label.config(text="Grouping and selecting songs...")
             root.update_idletasks()
             groups_by_artist = group_by_artist(songs)
-            selected_songs = select_songs_based_on_artist_count(groups_by_artist, songs_per_artist_value)
+            recent_ids = None
+            if rotate_songs.get() == 1:
+                recent_ids = recent_song_ids(music_folder_path, rotation_runs.get())
+                print(f"Rotation: avoiding {len(recent_ids)} songs exported in the last {rotation_runs.get()} runs")
+            selected_songs = select_songs_based_on_artist_count(groups_by_artist, songs_per_artist_value, recent_ids)
             if copy_mode_value:
                 limited_songs = limit_songs_by_size(selected_songs, max_size_gb_value * (1024 ** 3))
             else:
@@ -467,16 +494,20 @@ def start_process(root):
                 # Step 3: Copying or creating shortcuts for selected files
                 status_label.config(text="Copying or creating shortcuts for selected songs...")
                 root.update_idletasks()
-                copy_or_link_selected_songs(limited_songs, destination_folder_path, progress_var, status_label, root, copy_mode=copy_mode_value)
+                copy_or_link_selected_songs(limited_songs, destination_folder_path, progress_var, status_label, root, copy_mode=copy_mode_value,
+                                            max_workers=parallel_workers.get(), autotune=autotune_workers.get() == 1,
+                                            library_root=music_folder_path,
+                                            bandwidth_mb_s=copy_bandwidth_mb_s.get() or None, max_iops=copy_max_iops.get() or None)
                 overall_progress_var.set(100)  # Update overall progress to 100%
                 root.update_idletasks()
                 if stop_flag:
                     raise Exception("Process interrupted by user.")
+                record_export(music_folder_path, limited_songs, destination_folder_path)
                 messagebox.showinfo("Success", "Process completed successfully!")
             else:
                 messagebox.showwarning("Warning", "No songs selected within the size limit.")
         else:
-            messagebox.showwarning("Warning", "No MP3 files found in the specified folder.")
+            messagebox.showwarning("Warning", "No MP3 files match the filter." if filter_value else "No MP3 files found in the specified folder.")
     except Exception as e:
         print(f"Error: {e}")
         messagebox.showerror("Error", f"An error occurred: {e}")
@@ -504,7 +535,7 @@ def stop_process():
 # GUI Creation
 root = Tk()
 root.title("MP3 Music Selector")
-root.geometry("600x530")
+root.geometry("600x680")
 root.configure(bg="#f0f4f7")
 
 # Variáveis para armazenar os valores dos campos de entrada
@@ -518,7 +549,13 @@ use_cache = IntVar(value=1)  # Usar cache por padrão
 force_rescan = IntVar(value=0)  # Não forçar rescan por padrão
 only_cache = IntVar(value=0)    # Only create cache
 manual_cache_path = StringVar()
+filter_expression = StringVar()  # e.g. genre=rock year>=1990 duration<600
+rotate_songs = IntVar(value=0)  # Prefer songs not exported in the last runs
+rotation_runs = IntVar(value=4)  # Number of previous exports avoided by the rotation
 parallel_workers = IntVar(value=10)  # Increased default thread count
+autotune_workers = IntVar(value=0)  # Adapt worker counts to measured throughput
+copy_bandwidth_mb_s = IntVar(value=0)  # Copy bandwidth cap in MB/s (0 = unlimited)
+copy_max_iops = IntVar(value=0)  # Copy read operations per second cap (0 = unlimited)
 progress_var = IntVar(value=0)
 overall_progress_var = IntVar(value=0)
 
@@ -557,19 +594,39 @@ Label(frame, text="Manual Cache:", bg="#f0f4f7").grid(row=7, column=0, sticky='e
 Entry(frame, textvariable=manual_cache_path, width=50).grid(row=7, column=1)
 Button(frame, text="Browse", command=select_manual_cache_file, bg="#d9e4f5", activebackground="#c3d3ef").grid(row=7, column=2)
 
+Label(frame, text="Filter:", bg="#f0f4f7").grid(row=8, column=0, sticky='e')
+Entry(frame, textvariable=filter_expression, width=50).grid(row=8, column=1)
+Label(frame, text="e.g. genre=rock year>=1990", bg="#f0f4f7").grid(row=8, column=2, sticky='w')
+
+Label(frame, text="Rotation Runs:", bg="#f0f4f7").grid(row=9, column=0, sticky='e')
+Entry(frame, textvariable=rotation_runs).grid(row=9, column=1, sticky='w')
+Checkbutton(frame, text="Rotate Songs", variable=rotate_songs, bg="#f0f4f7").grid(row=9, column=2, sticky='w')
+
+Label(frame, text="Parallel Workers:", bg="#f0f4f7").grid(row=10, column=0, sticky='e')
+Entry(frame, textvariable=parallel_workers).grid(row=10, column=1, sticky='w')
+Checkbutton(frame, text="Auto-tune", variable=autotune_workers, bg="#f0f4f7").grid(row=10, column=2, sticky='w')
+
+Label(frame, text="Max Copy MB/s:", bg="#f0f4f7").grid(row=11, column=0, sticky='e')
+Entry(frame, textvariable=copy_bandwidth_mb_s).grid(row=11, column=1, sticky='w')
+Label(frame, text="0 = unlimited", bg="#f0f4f7").grid(row=11, column=2, sticky='w')
+
+Label(frame, text="Max Copy IOPS:", bg="#f0f4f7").grid(row=12, column=0, sticky='e')
+Entry(frame, textvariable=copy_max_iops).grid(row=12, column=1, sticky='w')
+Label(frame, text="0 = unlimited", bg="#f0f4f7").grid(row=12, column=2, sticky='w')
+
 start_button = Button(frame, text="Start", command=start_process_thread, bg="#b5d1f0", activebackground="#a4c4e8")
-start_button.grid(row=8, column=0, columnspan=2, pady=10)
+start_button.grid(row=13, column=0, columnspan=2, pady=10)
 
 stop_button = Button(frame, text="Stop", command=stop_process, bg="#f0b5b5", activebackground="#f0a4a4", state='disabled')
-stop_button.grid(row=8, column=2, pady=10)
+stop_button.grid(row=13, column=2, pady=10)
 
 progress = ttk.Progressbar(frame, orient="horizontal", length=400, mode="determinate", variable=progress_var)
-progress.grid(row=9, column=0, columnspan=3, pady=10)
+progress.grid(row=14, column=0, columnspan=3, pady=10)
 
 overall_progress = ttk.Progressbar(frame, orient="horizontal", length=400, mode="determinate", variable=overall_progress_var)
-overall_progress.grid(row=10, column=0, columnspan=3, pady=10)
+overall_progress.grid(row=15, column=0, columnspan=3, pady=10)
 
 status_label = Label(frame, text="", bg="#f0f4f7")
-status_label.grid(row=11, column=0, columnspan=3)
+status_label.grid(row=16, column=0, columnspan=3)
 
 root.mainloop()
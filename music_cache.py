@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager, nullcontext
+
+from mutagen.easyid3 import EasyID3
+from mutagen.mp3 import MP3
+
+import file_io
+from artist_names import resolve_artist
+from library_index import build_indexes, read_extended_tags
+
+# Cache shared by the GUI and the command line version
+cache_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# Version 3: canonical artist names and artist ids (artist_names.py).
+# Version 2: normalized artists, song ids, extended tags, failures and indexes.
+# Older caches (version 1 has no "version" key) are upgraded in memory when loaded.
+CACHE_VERSION = 3
+
+lock_timeout = 60  # Seconds to wait for another process holding the cache lock
+
+
+def song_id(path):
+    """Stable 63-bit integer ID of a song, derived from its path."""
+    digest = hashlib.md5(os.path.normpath(path).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') & 0x7FFFFFFFFFFFFFFF
+
+
+def get_cache_filename(music_folder):
+    """Cache file of a music folder; the name is stable across processes and front ends."""
+    folder_hash = hashlib.md5(os.path.normpath(music_folder).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_folder, f"music_cache_{folder_hash}.json")
+
+
+def find_legacy_cache_file(music_folder):
+    """Cache written by older versions, whose file names used Python's per-process hash()."""
+    if not os.path.exists(cache_folder):
+        return None
+    normalized_music_folder = os.path.normpath(music_folder)
+    candidates = []
+    for file in os.listdir(cache_folder):
+        name = file[len("music_cache_"):-len(".json")]
+        if file.startswith("music_cache_") and file.endswith(".json") and name.isdigit():
+            cache_file = os.path.join(cache_folder, file)
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cached_folder = json.load(f).get("music_folder", "")
+            except (OSError, ValueError):
+                continue
+            if os.path.normpath(cached_folder) == normalized_music_folder:
+                candidates.append((os.path.getmtime(cache_file), cache_file))
+    return max(candidates)[1] if candidates else None
+
+
+def find_cache_file(music_folder):
+    """Current cache file of the folder, falling back to one written by an older version."""
+    cache_file = get_cache_filename(music_folder)
+    if os.path.exists(cache_file):
+        return cache_file
+    return find_legacy_cache_file(music_folder)
+
+
+def get_folder_modification_time(folder):
+    """Latest modification time of the folder, its subfolders and MP3 files."""
+    latest_time = 0
+    for root, dirs, files in file_io.walk(folder):
+        try:
+            folder_time = file_io.getmtime(root)
+        except OSError:
+            continue
+        if folder_time > latest_time:
+            latest_time = folder_time
+        for file in files:
+            if file.lower().endswith('.mp3'):
+                try:
+                    file_time = file_io.getmtime(os.path.join(root, file))
+                    if file_time > latest_time:
+                        latest_time = file_time
+                except OSError:
+                    continue
+    return latest_time
+
+
+def advise_prefix(f, prefix_bytes):
+    """Tells the OS that the first `prefix_bytes` of the open file will be read next (where posix_fadvise exists)."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(f.fileno(), 0, prefix_bytes, os.POSIX_FADV_WILLNEED)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+
+def read_song_record(file_path, prefix_bytes=None):
+    """Reads one MP3 and returns its cache record (raises if the tags can't be read).
+
+    With `prefix_bytes`, read-ahead of the start of the file (where the ID3 tag is) is requested first.
+    """
+    with file_io.open_file(file_path, 'rb') as f:
+        if prefix_bytes:
+            advise_prefix(f, prefix_bytes)
+        audio = MP3(f, ID3=EasyID3)
+        stat = file_io.stat(file_path)
+    artist, artist_key = resolve_artist(audio.get("artist", ["Unknown"])[0])
+    return {
+        "path": file_path,
+        "id": song_id(file_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "artist": artist,
+        "artist_id": artist_key,
+        "title": audio.get("title", ["Untitled"])[0],
+        **read_extended_tags(audio),
+    }
+
+
+@contextmanager
+def cache_lock(path, shared=False):
+    """Advisory lock on `path + ".lock"`, held by readers (shared) and writers (exclusive).
+
+    Uses fcntl.flock on POSIX and msvcrt.locking on Windows (which only has
+    exclusive locks, so readers are exclusive there too).
+    """
+    lock_path = path + ".lock"
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    handle = open(lock_path, 'a+')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            deadline = time.monotonic() + lock_timeout
+            while True:
+                try:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Cache is locked by another process: {path}")
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
+
+
+@contextmanager
+def atomic_write(path, locked=True, binary=False):
+    """Writes to a temporary file next to `path` and moves it into place with os.replace.
+
+    A crash or Stop in the middle leaves the previous file untouched. With
+    `locked` the exclusive cache lock is held for the whole write (pass False
+    when the caller already holds it). With `binary` the file is opened in "wb" mode.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with cache_lock(path) if locked else nullcontext():
+        try:
+            with open(temp_path, 'wb') if binary else open(temp_path, 'w', encoding='utf-8') as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+def write_json_atomic(path, data, indent=None):
+    with atomic_write(path) as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+
+
+def read_json_locked(path):
+    """Reads a JSON file under the shared cache lock (None if missing or unreadable)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with cache_lock(path, shared=True):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {path}: {e}")
+        return None
+
+
+def build_cache_data(songs, music_folder, failures=None, folder_mod_time=None):
+    """Cache contents in the current schema version."""
+    return {
+        "version": CACHE_VERSION,
+        "timestamp": time.time(),
+        "music_folder": music_folder,
+        "folder_mod_time": folder_mod_time if folder_mod_time is not None else get_folder_modification_time(music_folder),
+        "songs": songs,
+        "total_songs": len(songs),
+        "failures": failures or [],
+        "indexes": build_indexes(songs),
+    }
+
+
+def save_cache_data(songs, music_folder, failures=None, folder_mod_time=None):
+    """Builds and atomically writes the cache; returns the cache file path."""
+    cache_file = get_cache_filename(music_folder)
+    write_json_atomic(cache_file, build_cache_data(songs, music_folder, failures, folder_mod_time), indent=2)
+    return cache_file
+
+
+def upgrade_cache_data(cache_data):
+    """Brings older caches to the current schema; returns None for unknown (newer) versions."""
+    version = cache_data.get("version", 1)
+    if version > CACHE_VERSION:
+        print(f"Cache version {version} is newer than supported ({CACHE_VERSION}).")
+        return None
+    if version < CACHE_VERSION:
+        # Version 1 (GUI) only lowercased artists and had no ids, tags or failures;
+        # version 2 had no canonical artists. Stored names are resolved again with the current rules.
+        for song in cache_data.get("songs", []):
+            song["artist"], song["artist_id"] = resolve_artist(song.get("artist", "unknown"))
+            song.setdefault("id", song_id(song["path"]))
+        cache_data.setdefault("failures", [])
+        cache_data["indexes"] = None
+        cache_data["version"] = CACHE_VERSION
+    return cache_data
+
+
+def load_cache_data(cache_file):
+    """Reads a cache file under the lock and upgrades it to the current schema."""
+    cache_data = read_json_locked(cache_file)
+    if cache_data is None:
+        return None
+    return upgrade_cache_data(cache_data)
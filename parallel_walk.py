@@ -0,0 +1,60 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import file_io
+
+max_listings = 16  # Default number of directory listings in flight at once
+
+
+def is_mp3(name):
+    return name.endswith(".mp3")
+
+
+def walk_files(root, listings=None, recursive=True, match=is_mp3, scandir=None):
+    """Yields the paths of matching files under `root`, listing directories concurrently.
+
+    Every listing is one round trip on SMB/NFS mounts, so up to `listings` directories
+    are listed at the same time and their files are yielded as soon as each listing
+    returns (in no particular order). Unreadable directories are skipped like os.walk
+    does. Closing the generator early stops the remaining listings.
+    """
+    listings = listings or max_listings
+    scandir = scandir or file_io.scandir
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def list_directory(path):
+        files, subdirs = [], []
+        try:
+            with scandir(path) as entries:
+                for entry in entries:
+                    if stop.is_set():
+                        break
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif match(entry.name):
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        results.put((files, subdirs))
+
+    executor = ThreadPoolExecutor(max_workers=listings)
+    try:
+        executor.submit(list_directory, root)
+        pending = 1
+        while pending:
+            files, subdirs = results.get()
+            pending -= 1
+            if recursive:
+                for subdir in subdirs:
+                    executor.submit(list_directory, subdir)
+                pending += len(subdirs)
+            yield from files
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+
+import file_io
+from music_cache import cache_folder
+
+# Structured log with one JSON line per unreadable file
+error_log_file = os.path.join(cache_folder, "scan_errors.jsonl")
+
+console_limit_per_class = 5  # Errors of the same class printed to the console before going quiet
+
+
+def get_file_signature(file_path):
+    """Returns (size, mtime) of the file, used to detect when it changes."""
+    stat = file_io.stat(file_path)
+    return stat.st_size, stat.st_mtime
+
+
+class ScanErrorLog:
+    """Collects tag-reading failures from worker threads.
+
+    Every failure is written to `error_log_file` and kept in `failures` (to be
+    stored in the cache), but only the first `console_limit_per_class` errors of
+    each class are printed; `summary()` prints the totals at the end.
+    """
+
+    def __init__(self, log_file=None):
+        self.log_file = log_file or error_log_file
+        self.failures = []
+        self.counts = defaultdict(int)
+        self.reported = defaultdict(int)
+        self.lock = threading.Lock()
+        self.handle = None
+
+    def record(self, file_path, error, signature=None):
+        """Records a failure; `signature` is reused when the file was skipped as a known failure."""
+        error_class = type(error).__name__ if isinstance(error, BaseException) else str(error)
+        if signature is None:
+            try:
+                signature = get_file_signature(file_path)
+            except OSError:
+                signature = (None, None)
+        failure = {"path": file_path, "size": signature[0], "mtime": signature[1], "error": error_class}
+
+        with self.lock:
+            self.failures.append(failure)
+            self.counts[error_class] += 1
+            if not isinstance(error, BaseException):
+                # Known failure carried over from the cache: nothing new to report
+                return failure
+            self.reported[error_class] += 1
+            if self.reported[error_class] <= console_limit_per_class:
+                print(f"Error reading {file_path}: {error_class}: {error}")
+                if self.reported[error_class] == console_limit_per_class:
+                    print(f"Further {error_class} errors are only written to {self.log_file}")
+            self._write({"time": time.time(), **failure, "message": str(error)})
+        return failure
+
+    def _write(self, record):
+        try:
+            if self.handle is None:
+                os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+                self.handle = open(self.log_file, 'a', encoding='utf-8')
+            self.handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+    def summary(self):
+        """Prints the failures grouped by error class and closes the log file."""
+        with self.lock:
+            if self.handle:
+                self.handle.close()
+                self.handle = None
+            if not self.counts:
+                return
+            details = ", ".join(f"{error_class}: {count}" for error_class, count in sorted(self.counts.items()))
+            print(f"Unreadable files: {len(self.failures)} ({details})")
+
+
+def index_failures(failures):
+    """Indexes cached failures by path."""
+    return {failure["path"]: failure for failure in failures or []}
+
+
+def skip_known_failure(file_path, known_failures, error_log):
+    """True if the file failed before and has not changed since.
+
+    The failure is carried over into `error_log` so it stays in the cache.
+    """
+    failure = known_failures.get(file_path) if known_failures else None
+    if not failure:
+        return False
+    try:
+        signature = get_file_signature(file_path)
+    except OSError:
+        return False
+    if signature != (failure.get("size"), failure.get("mtime")):
+        return False
+    error_log.record(file_path, failure.get("error", "Error"), signature)
+    return True
+
+
+def split_known_failures(file_paths, known_failures, error_log):
+    """Returns the paths that still need to be read, skipping unchanged known failures."""
+    if not known_failures:
+        return file_paths
+    to_scan = [file_path for file_path in file_paths
+               if not skip_known_failure(file_path, known_failures, error_log)]
+    skipped = len(file_paths) - len(to_scan)
+    if skipped:
+        print(f"Skipping {skipped} unchanged files that failed in a previous scan")
+    return to_scan
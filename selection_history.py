@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+from array import array
+
+from music_cache import cache_folder, cache_lock, atomic_write, song_id
+
+# Export history per library: one compact set of song IDs per run
+history_folder = cache_folder
+
+max_history_runs = 52  # Runs kept in the history file (one year of weekly exports)
+
+# Concurrent exports (selection server jobs) append to the same file
+history_lock = threading.Lock()
+
+
+def get_song_id(song):
+    """ID stored in the song record (computed and kept there for older caches)."""
+    if "id" not in song:
+        song["id"] = song_id(song["path"])
+    return song["id"]
+
+
+def get_history_filename(library_root):
+    folder_hash = hashlib.md5(os.path.normpath(library_root).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(history_folder, f"export_history_{folder_hash}.json")
+
+
+def load_history(library_root):
+    """Returns the previous runs, newest last, as [{"timestamp", "destination", "ids": array}]."""
+    try:
+        with open(get_history_filename(library_root), 'r', encoding='utf-8') as f:
+            runs = json.load(f).get("runs", [])
+    except (OSError, ValueError):
+        return []
+    for run in runs:
+        ids = array('q')
+        ids.frombytes(base64.b64decode(run["ids"]))
+        run["ids"] = ids
+    return runs
+
+
+def recent_song_ids(library_root, runs):
+    """Set with the IDs exported in the last `runs` runs."""
+    if not runs:
+        return set()
+    recent = set()
+    for run in load_history(library_root)[-runs:]:
+        recent.update(run["ids"])
+    return recent
+
+
+def record_export(library_root, songs, destination=None):
+    """Appends one run with the exported songs to the history (sorted int64 array, base64)."""
+    with history_lock:
+        _record_export(library_root, songs, destination)
+
+
+def _record_export(library_root, songs, destination):
+    history_file = get_history_filename(library_root)
+    try:
+        # The lock covers the whole read-modify-write, also against other processes
+        with cache_lock(history_file):
+            runs = load_history(library_root)
+            runs.append({"timestamp": time.time(), "destination": destination,
+                         "ids": array('q', sorted(get_song_id(song) for song in songs))})
+            runs = runs[-max_history_runs:]
+            history = {
+                "library_root": library_root,
+                "runs": [{**run, "ids": base64.b64encode(run["ids"].tobytes()).decode('ascii')} for run in runs],
+            }
+            with atomic_write(history_file, locked=False) as f:
+                json.dump(history, f)
+        print(f"Export history updated: {len(songs)} songs ({len(runs)} runs kept)")
+    except OSError as e:
+        print(f"Could not save export history: {e}")
+
+
+def population_ids(songs):
+    """IDs of the songs, read from the integer id column when the list has one (snapshot)."""
+    song_ids = getattr(songs, "song_ids", None)
+    if song_ids is not None:
+        return song_ids()
+    return [get_song_id(song) for song in songs]
+
+
+def make_rotation_sampler(recent_ids, mode="avoid", weight=0.2, ids_of=population_ids):
+    """Returns a `sample(songs, k)` replacement for random.sample that rotates the library.
+
+    "avoid": songs exported recently are only used when an artist has too few others.
+    "weight": recent songs stay possible but with `weight` times the chance of the others
+    (weighted sampling without replacement, Efraimidis-Spirakis keys).
+    `ids_of(songs)` gives the keys looked up in `recent_ids`; only the chosen songs are
+    accessed, so snapshot records are not built for the whole population.
+    """
+    def sample_avoid(songs, k):
+        recent = list(map(recent_ids.__contains__, ids_of(songs)))
+        fresh = [i for i, is_recent in enumerate(recent) if not is_recent]
+        if len(fresh) >= k:
+            chosen = random.sample(fresh, k)
+        else:
+            stale = [i for i, is_recent in enumerate(recent) if is_recent]
+            chosen = fresh + random.sample(stale, min(k - len(fresh), len(stale)))
+        return [songs[i] for i in chosen]
+
+    def sample_weight(songs, k):
+        recent_exponent = 1.0 / max(weight, 1e-6)
+        keyed = [(random.random() ** (recent_exponent if is_recent else 1.0), i)
+                 for i, is_recent in enumerate(map(recent_ids.__contains__, ids_of(songs)))]
+        keyed.sort(reverse=True)
+        return [songs[i] for _, i in keyed[:k]]
+
+    if not recent_ids:
+        return random.sample
+    return sample_weight if mode == "weight" else sample_avoid
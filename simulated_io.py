@@ -0,0 +1,114 @@
+import errno
+import random
+import threading
+import time
+
+from file_io import LocalBackend
+from transfer import TokenBucket
+
+OPERATIONS = ("scandir", "stat", "open", "read", "write", "remove", "copystat", "replace")
+
+
+class SimulatedBackend(LocalBackend):
+    """Local filesystem made to behave like a slow or unreliable disk/share, for benchmarks and tests.
+
+    latency: seconds added to every operation, or {operation: seconds} (see OPERATIONS).
+    bandwidth_mb_s: MB/s shared by all reads and writes through this backend (None = unlimited).
+    error_rate: probability of an operation failing with EIO, or {operation: probability}.
+    failing_paths: paths (or a predicate on the path) whose operations always fail with EIO.
+    seed: seed of the error draws, so a run can be repeated.
+    """
+
+    def __init__(self, latency=0.0, bandwidth_mb_s=None, error_rate=0.0, failing_paths=(), seed=None):
+        self.latency = self._per_operation(latency)
+        self.error_rate = self._per_operation(error_rate)
+        # Bursts of at most 0.1 s of bandwidth, so short runs are throttled too
+        rate = bandwidth_mb_s * 1024 ** 2 if bandwidth_mb_s else None
+        self.bandwidth = TokenBucket(rate, rate / 10) if rate else None
+        self.is_failing_path = failing_paths if callable(failing_paths) else frozenset(failing_paths).__contains__
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(OPERATIONS, 0)
+        self.bytes = {"read": 0, "write": 0}
+        self.errors = 0
+
+    @staticmethod
+    def _per_operation(value):
+        if isinstance(value, dict):
+            unknown = set(value) - set(OPERATIONS)
+            if unknown:
+                raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}")
+            return {operation: value.get(operation, 0.0) for operation in OPERATIONS}
+        return dict.fromkeys(OPERATIONS, value or 0.0)
+
+    def _operation(self, operation, path):
+        """Counts the operation, waits its latency and raises the injected error, if any."""
+        with self.lock:
+            self.counts[operation] += 1
+            fail = self.error_rate[operation] and self.random.random() < self.error_rate[operation]
+        if self.latency[operation]:
+            time.sleep(self.latency[operation])
+        if fail or self.is_failing_path(str(path)):
+            with self.lock:
+                self.errors += 1
+            raise OSError(errno.EIO, f"Simulated I/O error ({operation})", str(path))
+
+    def _transfer(self, direction, amount):
+        with self.lock:
+            self.bytes[direction] += amount
+        if self.bandwidth:
+            self.bandwidth.consume(amount)
+
+    def scandir(self, path):
+        self._operation("scandir", path)
+        return super().scandir(path)
+
+    def stat(self, path):
+        self._operation("stat", path)
+        return super().stat(path)
+
+    def open(self, path, mode='rb'):
+        self._operation("open", path)
+        return SimulatedFile(self, path, super().open(path, mode))
+
+    def remove(self, path):
+        self._operation("remove", path)
+        super().remove(path)
+
+    def copystat(self, source_path, destination_path):
+        self._operation("copystat", destination_path)
+        super().copystat(source_path, destination_path)
+
+    def replace(self, source_path, destination_path):
+        self._operation("replace", destination_path)
+        super().replace(source_path, destination_path)
+
+
+class SimulatedFile:
+    """File object whose reads and writes pay the backend's latency and bandwidth."""
+
+    def __init__(self, backend, path, file):
+        self.backend = backend
+        self.path = path
+        self.file = file
+
+    def read(self, size=-1):
+        self.backend._operation("read", self.path)
+        data = self.file.read(size)
+        self.backend._transfer("read", len(data))
+        return data
+
+    def write(self, data):
+        self.backend._operation("write", self.path)
+        self.backend._transfer("write", len(data))
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        # seek, tell, close, name... go straight to the real file
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
@@ -0,0 +1,160 @@
+import os
+import sys
+import types
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The shortcut mode needs pywin32; copies and scans do not
+for name in ("pythoncom", "win32com", "win32com.client"):
+    sys.modules.setdefault(name, types.ModuleType(name))
+sys.modules["win32com"].client = sys.modules["win32com.client"]
+
+from mutagen.easyid3 import EasyID3
+
+import file_io
+import export_plan
+import music_cache
+import mp3_selector
+from simulated_io import SimulatedBackend
+from scan_errors import ScanErrorLog
+from fanout_export import export_fanout
+
+# One MPEG-1 Layer III frame (128 kbps, 44.1 kHz) of silence
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+def write_mp3(path, artist, title):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(MP3_FRAME * 20)
+    tags = EasyID3()
+    tags["artist"] = artist
+    tags["title"] = title
+    tags.save(path)
+
+
+class SimulatedBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.library = os.path.join(self.folder, "library")
+        self.paths = []
+        for number in range(6):
+            path = os.path.join(self.library, f"Artist {number % 3}", f"song{number}.mp3")
+            write_mp3(path, f"Artist {number % 3}", f"Song {number}")
+            self.paths.append(path)
+        self.error_log = ScanErrorLog(os.path.join(self.folder, "scan_errors.jsonl"))
+        # Cache, throughput and scheduler settings of this test only
+        self.settings = [(music_cache, "cache_folder", os.path.join(self.folder, "cache")),
+                         (export_plan, "throughput_file", os.path.join(self.folder, "copy_throughput.json")),
+                         (mp3_selector, "scan_scheduler", "fifo"),
+                         (mp3_selector, "use_snapshot", False),
+                         (mp3_selector, "autotune_workers", False)]
+        self.previous_settings = [(module, name, getattr(module, name)) for module, name, _ in self.settings]
+        for module, name, value in self.settings:
+            setattr(module, name, value)
+        self.previous_backend = file_io.backend
+
+    def tearDown(self):
+        file_io.use_backend(self.previous_backend)
+        for module, name, value in self.previous_settings:
+            setattr(module, name, value)
+        self.error_log.summary()
+        shutil.rmtree(self.folder)
+
+    def scan(self, error_log=None):
+        return mp3_selector.list_mp3_files_parallel(self.library, max_workers=4, error_log=error_log or self.error_log)
+
+    def test_scan_records_and_skips_failing_files(self):
+        failing = self.paths[1]
+        unreadable_folder = os.path.dirname(self.paths[2])
+        # The folder that cannot be listed is skipped with its files, the failing file is recorded
+        in_listable_folders = {path for path in self.paths if os.path.dirname(path) != unreadable_folder}
+        for scheduler in ("fifo", "locality"):
+            with self.subTest(scheduler=scheduler):
+                mp3_selector.scan_scheduler = scheduler
+                backend = SimulatedBackend(latency=0.001, failing_paths={failing, unreadable_folder})
+                file_io.use_backend(backend)
+                error_log = ScanErrorLog(os.path.join(self.folder, f"scan_errors_{scheduler}.jsonl"))
+
+                songs = self.scan(error_log)
+
+                scanned = {song["path"] for song in songs}
+                self.assertEqual(scanned, in_listable_folders - {failing})
+                self.assertEqual([failure["path"] for failure in error_log.failures], [failing])
+                self.assertEqual(error_log.failures[0]["error"], "OSError")
+                self.assertEqual({song["title"] for song in songs}, {f"Song {self.paths.index(path)}" for path in scanned})
+                self.assertGreater(backend.counts["scandir"], 0)
+
+    def test_scan_with_random_errors_accounts_for_every_file(self):
+        backend = SimulatedBackend(error_rate={"open": 0.5}, seed=7)
+        file_io.use_backend(backend)
+
+        songs = self.scan()
+
+        self.assertEqual(backend.errors, len(self.error_log.failures))
+        self.assertEqual(len(songs) + len(self.error_log.failures), len(self.paths))
+        self.assertTrue(songs and self.error_log.failures)
+
+    def test_load_cache_rejects_missing_or_failing_files(self):
+        songs = self.scan()
+        self.assertTrue(mp3_selector.save_cache(songs, self.library))
+        self.assertEqual(len(mp3_selector.load_cache(self.library)), len(self.paths))
+
+        # A cached file that can no longer be read through the backend invalidates the cache
+        backend = SimulatedBackend(failing_paths={self.paths[3]})
+        file_io.use_backend(backend)
+        self.assertIsNone(mp3_selector.load_cache(self.library))
+        self.assertGreater(backend.counts["stat"], 0)
+
+        # With the snapshot, a removed file is noticed through the folder modification time
+        file_io.use_backend(SimulatedBackend())
+        mp3_selector.use_snapshot = True
+        self.assertTrue(mp3_selector.save_cache(songs, self.library))
+        self.assertEqual(len(mp3_selector.load_cache(self.library)), len(self.paths))
+        os.remove(self.paths[4])
+        self.assertIsNone(mp3_selector.load_cache(self.library))
+
+    def test_parallel_copy_skips_failing_sources(self):
+        songs = self.scan()
+        failing_source = self.paths[0]
+        destination = os.path.join(self.folder, "stick")
+        backend = SimulatedBackend(bandwidth_mb_s=50, failing_paths={failing_source})
+        file_io.use_backend(backend)
+
+        result = mp3_selector.copy_or_link_selected_songs_parallel(songs, destination, max_workers=3, library_root=self.library)
+
+        self.assertEqual(result, (len(self.paths) - 1, 1))
+        self.assertEqual(sorted(os.listdir(destination)), sorted(os.path.basename(path) for path in self.paths[1:]))
+        for path in self.paths[1:]:
+            with open(path, 'rb') as source, open(os.path.join(destination, os.path.basename(path)), 'rb') as copy:
+                self.assertEqual(source.read(), copy.read())
+        self.assertEqual(backend.bytes["read"], sum(os.path.getsize(path) for path in self.paths[1:]))
+        self.assertEqual(backend.bytes["write"], backend.bytes["read"])
+
+    def test_copy_skips_failing_sources_and_destinations(self):
+        failing_source = self.paths[0]
+        good, bad = os.path.join(self.folder, "stick1"), os.path.join(self.folder, "stick2")
+        os.makedirs(bad)
+        backend = SimulatedBackend(bandwidth_mb_s=50, failing_paths=lambda path: path == failing_source or path.startswith(bad + os.sep))
+        file_io.use_backend(backend)
+
+        results = export_fanout([{"path": path} for path in self.paths], [good, bad], read_workers=2)
+
+        self.assertEqual(results[good], (len(self.paths) - 1, 1))
+        self.assertEqual(results[bad], (0, len(self.paths)))
+        self.assertEqual(os.listdir(bad), [])
+        copied = sorted(os.listdir(good))
+        self.assertEqual(copied, sorted(os.path.basename(path) for path in self.paths[1:]))
+        for path in self.paths[1:]:
+            with open(path, 'rb') as source, open(os.path.join(good, os.path.basename(path)), 'rb') as copy:
+                self.assertEqual(source.read(), copy.read())
+        # Every source was read once, however many destinations there are
+        self.assertEqual(backend.bytes["read"], sum(os.path.getsize(path) for path in self.paths[1:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
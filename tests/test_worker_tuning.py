@@ -0,0 +1,77 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import worker_tuning
+from worker_tuning import WorkerAutotuner
+
+
+def plateau(workers):
+    """Throughput grows with the workers up to 8 and stays flat above."""
+    return 100.0 * min(workers, 8)
+
+
+def slow_decline(workers):
+    """Peak at 8 workers, then 3% less per extra worker (below the improvement margin)."""
+    return 100.0 * workers if workers <= 8 else 800.0 * 0.97 ** (workers - 8)
+
+
+class WorkerAutotunerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.tuning_file = worker_tuning.tuning_file
+        worker_tuning.tuning_file = os.path.join(self.folder, "worker_tuning.json")
+
+    def tearDown(self):
+        worker_tuning.tuning_file = self.tuning_file
+        shutil.rmtree(self.folder)
+
+    def drive(self, tuner, curve, intervals=60):
+        """Feeds `curve(workers)` to the tuner for some intervals; returns the worker counts used."""
+        used = []
+        with redirect_stdout(StringIO()):
+            for _ in range(intervals):
+                used.append(tuner.workers)
+                tuner._adjust(curve(tuner.workers))
+        return used
+
+    def test_settles_at_the_peak(self):
+        for curve in (plateau, slow_decline):
+            for initial_workers in (1, 5, 8, 20, 32):
+                with self.subTest(curve=curve.__name__, initial_workers=initial_workers):
+                    tuner = WorkerAutotuner(self.folder, "scan", initial_workers)
+                    used = self.drive(tuner, curve)
+                    self.assertEqual(used[-10:], [8] * 10)
+                    self.assertEqual(tuner.best_workers, 8)
+                    # It never wanders far past the peak on the way
+                    if initial_workers <= 8:
+                        self.assertLessEqual(max(used), 9)
+
+    def test_explores_again_when_conditions_change(self):
+        tuner = WorkerAutotuner(self.folder, "copy", 5)
+        self.drive(tuner, plateau)
+        self.assertEqual(tuner.workers, 8)
+
+        used = self.drive(tuner, lambda workers: 50.0 * min(workers, 4))
+
+        self.assertEqual(used[-10:], [4] * 10)
+        self.assertEqual(tuner.best_workers, 4)
+
+    def test_finish_remembers_the_best_count(self):
+        tuner = WorkerAutotuner(self.folder, "scan", 5)
+        self.drive(tuner, slow_decline)
+        with redirect_stdout(StringIO()):
+            tuner.finish()
+
+        self.assertEqual(WorkerAutotuner(self.folder, "scan", 5).workers, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import time
+import threading
+
+import file_io
+
+copy_chunk_size = 1024 * 1024  # Bytes per read/write while copying (one "I/O operation" for the IOPS cap)
+speed_window = 3.0  # Seconds used for the instantaneous throughput
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all copy workers.
+
+    `rate` tokens are added per second up to `capacity`; `consume(n)` blocks
+    until all n tokens were paid (in capacity-sized parts when n is larger).
+    A bucket with `rate=None` never blocks.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity or 0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        if not self.rate:
+            return
+        # Requests larger than the bucket are paid in bucket-sized parts, so the full amount is charged
+        while amount > 0:
+            part = min(amount, self.capacity)
+            self._consume_part(part)
+            amount -= part
+
+    def _consume_part(self, amount):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CopyProgress:
+    """Bytes copied so far, instantaneous/average MB/s and ETA."""
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.copied_bytes = 0
+        self.start_time = time.monotonic()
+        self.samples = [(self.start_time, 0)]
+        self.lock = threading.Lock()
+
+    def add(self, amount):
+        with self.lock:
+            self.copied_bytes += amount
+            now = time.monotonic()
+            self.samples.append((now, self.copied_bytes))
+            while len(self.samples) > 2 and now - self.samples[0][0] > speed_window:
+                self.samples.pop(0)
+
+    def skip(self, amount):
+        """Removes the bytes of a file that will not be copied (failed or interrupted)."""
+        with self.lock:
+            self.total_bytes -= amount
+
+    def snapshot(self):
+        """Returns (copied_bytes, total_bytes, current_mb_s, average_mb_s, eta_seconds)."""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.start_time
+            average = self.copied_bytes / elapsed if elapsed > 0 else 0
+            window_time, window_bytes = self.samples[0]
+            current = (self.copied_bytes - window_bytes) / (now - window_time) if now > window_time else 0
+            remaining = max(0, self.total_bytes - self.copied_bytes)
+            speed = current or average
+            eta = remaining / speed if speed > 0 else None
+            return self.copied_bytes, self.total_bytes, current / 1024 ** 2, average / 1024 ** 2, eta
+
+    def format(self):
+        copied, total, current, average, eta = self.snapshot()
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta is not None else "--:--:--"
+        return (f"{copied / 1024 ** 2:,.1f}/{total / 1024 ** 2:,.1f} MB - "
+                f"{current:.1f} MB/s (avg {average:.1f}) - ETA {eta_text}")
+
+
+def create_copy_limits(bandwidth_mb_s=None, max_iops=None):
+    """Returns the (bandwidth, iops) buckets for the given caps (None/0 = unlimited)."""
+    bandwidth = TokenBucket(bandwidth_mb_s * 1024 ** 2) if bandwidth_mb_s else None
+    iops = TokenBucket(max_iops) if max_iops else None
+    return bandwidth, iops
+
+
+def copy_file_with_limits(source_path, destination_path, progress=None, limits=None, should_stop=None):
+    """Copies a file in chunks like shutil.copy2, honouring the shared limits.
+
+    Returns the number of bytes copied; a partial file is removed (and 0 is
+    returned) if `should_stop()` becomes true in the middle of the copy.
+    """
+    bandwidth, iops = limits or (None, None)
+    copied = 0
+    interrupted = False
+    try:
+        with file_io.open_file(source_path, 'rb') as source, file_io.open_file(destination_path, 'wb') as destination:
+            while True:
+                if should_stop and should_stop():
+                    interrupted = True
+                    break
+                if iops:
+                    iops.consume(1)
+                chunk = source.read(copy_chunk_size)
+                if not chunk:
+                    break
+                if bandwidth:
+                    bandwidth.consume(len(chunk))
+                destination.write(chunk)
+                copied += len(chunk)
+                if progress:
+                    progress.add(len(chunk))
+    except Exception:
+        # The partial bytes do not count as copied
+        if progress:
+            progress.add(-copied)
+        raise
+    if interrupted:
+        if progress:
+            progress.add(-copied)
+        file_io.remove(destination_path)
+        return 0
+    file_io.copystat(source_path, destination_path)
+    return copied
+
+
+def read_file_with_limits(source_path, limits=None):
+    """Reads a whole file in `copy_chunk_size` chunks, honouring the shared limits."""
+    bandwidth, iops = limits or (None, None)
+    chunks = []
+    with file_io.open_file(source_path, 'rb') as source:
+        while True:
+            if iops:
+                iops.consume(1)
+            chunk = source.read(copy_chunk_size)
+            if not chunk:
+                break
+            if bandwidth:
+                bandwidth.consume(len(chunk))
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def write_buffer_to_file(data, source_path, destination_path, progress=None, should_stop=None):
+    """Writes an already read file in `copy_chunk_size` chunks and copies the source's timestamps.
+
+    Like copy_file_with_limits, returns the bytes written, or 0 (removing the partial
+    file) if `should_stop()` becomes true in the middle of the write.
+    """
+    view = memoryview(data)
+    written = 0
+    try:
+        with file_io.open_file(destination_path, 'wb') as destination:
+            while written < len(view):
+                if should_stop and should_stop():
+                    break
+                chunk = view[written:written + copy_chunk_size]
+                destination.write(chunk)
+                written += len(chunk)
+                if progress:
+                    progress.add(len(chunk))
+    except Exception:
+        if progress:
+            progress.add(-written)
+        raise
+    if written < len(view):
+        if progress:
+            progress.add(-written)
+        file_io.remove(destination_path)
+        return 0
+    file_io.copystat(source_path, destination_path)
+    return written
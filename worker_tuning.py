@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import threading
+
+from music_cache import cache_folder, cache_lock, atomic_write
+
+# Persisted worker counts, per library root and stage ("scan" / "copy")
+tuning_file = os.path.join(cache_folder, "worker_tuning.json")
+
+min_workers = 1  # Lower bound for the adaptive pools
+max_workers = 32  # Upper bound for the adaptive pools (the thread pool is created with this size)
+measure_interval = 2.0  # Seconds of work measured before each adjustment
+improvement_margin = 0.05  # Relative throughput change considered significant
+
+
+def load_tuned_workers(library_root, stage, default):
+    """Returns the worker count remembered for this root/stage, or `default`."""
+    try:
+        with open(tuning_file, 'r', encoding='utf-8') as f:
+            tuning = json.load(f)
+        return int(tuning[os.path.normpath(library_root)][stage])
+    except (OSError, ValueError, KeyError, TypeError):
+        return default
+
+
+def save_tuned_workers(library_root, stage, workers):
+    """Remembers the best worker count found for this root/stage."""
+    try:
+        with cache_lock(tuning_file):
+            try:
+                with open(tuning_file, 'r', encoding='utf-8') as f:
+                    tuning = json.load(f)
+            except (OSError, ValueError):
+                tuning = {}
+            tuning.setdefault(os.path.normpath(library_root), {})[stage] = workers
+            with atomic_write(tuning_file, locked=False) as f:
+                json.dump(tuning, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"Could not save worker tuning: {e}")
+
+
+class WorkerAutotuner:
+    """Hill-climbing concurrency limit for a thread pool.
+
+    The pool is created with `max_workers` threads and every task runs between
+    `acquire()` and `release(units)`, so only `workers` tasks do I/O at a time.
+    Every `measure_interval` seconds the throughput (units/s: files for the scan
+    stage, bytes for the copy stage) is compared with the best seen so far: the
+    limit keeps growing while that improves it by more than `improvement_margin`
+    (shrinking while it stays within the margin), then goes back to the best
+    count and stays there until the throughput at that count changes significantly.
+    """
+
+    def __init__(self, library_root, stage, initial_workers):
+        self.library_root = library_root
+        self.stage = stage
+        self.workers = max(min_workers, min(max_workers, load_tuned_workers(library_root, stage, initial_workers)))
+        self.best_workers = self.workers
+        self.best_rate = 0.0
+        self.step = 1
+        self.reversed = False
+        self.active = 0
+        self.units = 0
+        self.window_start = time.perf_counter()
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.active >= self.workers:
+                self.condition.wait()
+            self.active += 1
+
+    def release(self, units=1):
+        with self.condition:
+            self.active -= 1
+            self.units += units
+            elapsed = time.perf_counter() - self.window_start
+            if elapsed >= measure_interval:
+                self._adjust(self.units / elapsed)
+                self.units = 0
+                self.window_start = time.perf_counter()
+            self.condition.notify_all()
+
+    def _adjust(self, rate):
+        if self.step == 0:
+            # Settled on best_workers: re-measure it and explore again if conditions changed
+            if rate < self.best_rate * (1 - improvement_margin):
+                self._explore(rate, -1 if self.workers > min_workers else 1)
+            elif rate > self.best_rate * (1 + improvement_margin):
+                self._explore(rate, 1)
+            else:
+                self.best_rate = rate
+        elif rate > self.best_rate * (1 + improvement_margin):
+            # Significant gain over the best so far: keep moving in this direction
+            self.best_rate, self.best_workers = rate, self.workers
+        elif self.step < 0 and self.workers < self.best_workers and rate >= self.best_rate * (1 - improvement_margin):
+            # Fewer workers for about the same throughput: keep them and keep shrinking
+            self.best_rate, self.best_workers = max(rate, self.best_rate), self.workers
+        elif not self.reversed and abs(self.workers - self.best_workers) <= 1 and min_workers <= self.best_workers - self.step <= max_workers:
+            # The first step away from the best did not pay off: try the other side once
+            self.reversed = True
+            self.step = -self.step
+            self.workers = self.best_workers
+        else:
+            # No significant gain over the best (plateau or slow decline): settle on the best
+            self.workers = self.best_workers
+            self.step = 0
+        self.workers = max(min_workers, min(max_workers, self.workers + self.step))
+        print(f"[autotune:{self.stage}] {rate:,.1f} units/s -> {self.workers} workers")
+
+    def _explore(self, rate, step):
+        """Starts a new search from the current worker count, forgetting the old peak."""
+        self.best_rate, self.best_workers = rate, self.workers
+        self.step = step
+        self.reversed = False
+
+    def finish(self):
+        """Stores the best worker count for the next run."""
+        save_tuned_workers(self.library_root, self.stage, self.best_workers)
+        print(f"[autotune:{self.stage}] best: {self.best_workers} workers ({self.best_rate:,.1f} units/s)")
+        return self.best_workers